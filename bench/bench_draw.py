@@ -0,0 +1,63 @@
+# bench/bench_draw.py
+# 페이지당 마스킹 그리기: rect 마다 draw_rect / 주석 update (기존) vs shape 하나에 모아 한 번 commit
+#   python -m bench.bench_draw [--rects 50 200 1000 --pages 5]
+import argparse, random, time
+import fitz  # PyMuPDF
+
+from engine.mask_engine import DEFAULTS, _mark_page
+from bench.synth import make_pdf
+
+_STROKE = tuple(DEFAULTS["stroke_color"])
+
+
+def _legacy_mark(page, pno, rects, cfg):
+    # 기존 경로: rect 마다 주석 모양을 만들고, rect 마다 shape 을 새로 commit
+    if cfg["mode"] == "redact":
+        for r in rects:
+            annot = page.add_redact_annot(r, fill=(1, 1, 1))
+            try: annot.set_colors(stroke=_STROKE); annot.update()
+            except Exception: pass
+        page.apply_redactions()
+        for r in rects: page.draw_rect(r, color=_STROKE, width=cfg["stroke_width"], fill=None, overlay=True)
+    else:
+        for r in rects: page.draw_rect(r, color=tuple(cfg["highlight_color"]), width=cfg["line_width"], fill=None, overlay=True)
+
+
+def _rects(page, n, rng):
+    w, h = page.rect.width, page.rect.height
+    out = []
+    for _ in range(n):
+        x, y = rng.uniform(40, w - 80), rng.uniform(40, h - 30)
+        out.append(fitz.Rect(x, y, x + rng.uniform(15, 60), y + 11))
+    return out
+
+
+def _measure(data, fn, n, cfg):
+    doc = fitz.open(stream=data, filetype="pdf")
+    rng = random.Random(n)
+    before = sum(len(doc.xref_stream(x)) for p in doc for x in p.get_contents())
+    t = time.perf_counter()
+    for page in doc: fn(page, page.number, _rects(page, n, rng), cfg)
+    elapsed = time.perf_counter() - t
+    after = sum(len(doc.xref_stream(x)) for p in doc for x in p.get_contents())
+    return elapsed / len(doc), (after - before) / len(doc)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rects", type=int, nargs="+", default=[50, 200, 1000], help="페이지당 rect 수")
+    ap.add_argument("--pages", type=int, default=5)
+    args = ap.parse_args()
+
+    data = make_pdf(pages=args.pages, lines_per_page=40)
+    print(f"{'mode':<10} {'rects':>6} {'path':>8} {'ms/page':>8} {'content KB/page':>16}")
+    for mode in ("highlight", "redact"):
+        cfg = DEFAULTS.copy(); cfg["mode"] = mode; cfg["mask_ratio"] = 1.0
+        for n in args.rects:
+            for label, fn in (("per-rect", _legacy_mark), ("batched", _mark_page)):
+                per_page, grown = _measure(data, fn, n, cfg)
+                print(f"{mode:<10} {n:>6} {label:>8} {per_page * 1e3:>8.1f} {grown / 1024:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
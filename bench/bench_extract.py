@@ -0,0 +1,48 @@
+# bench/bench_extract.py
+# 텍스트 추출: rawdict 기본 플래그 (이미지 블록까지 디코딩/복사) vs TEXT_FLAGS (이미지 보존 끔)
+#   python -m bench.bench_extract [--pages 30 --images 4]
+import argparse, time, tracemalloc
+import fitz  # PyMuPDF
+
+from engine.mask_engine import TEXT_FLAGS
+from bench.synth import make_pdf
+
+
+def _extract(doc, flags):
+    image_bytes = 0
+    for page in doc:
+        raw = page.get_text("rawdict", textpage=page.get_textpage(flags=flags))
+        image_bytes += sum(len(b.get("image", b"")) for b in raw["blocks"] if b.get("type") == 1)
+    return image_bytes
+
+
+def _measure(doc, flags):
+    t = time.perf_counter()
+    image_bytes = _extract(doc, flags)
+    elapsed = time.perf_counter() - t
+    tracemalloc.start()
+    _extract(doc, flags)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / len(doc), peak, image_bytes
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=30)
+    ap.add_argument("--images", type=int, default=4, help="합성 문서의 페이지당 이미지 수")
+    args = ap.parse_args()
+
+    docs = [("sample_data/test_1.pdf", open("sample_data/test_1.pdf", "rb").read()),
+            ("sample_data/test_2.pdf", open("sample_data/test_2.pdf", "rb").read()),
+            (f"synthetic {args.pages}p x{args.images}img", make_pdf(pages=args.pages, lines_per_page=20, images=args.images))]
+    print(f"{'document':<28} {'flags':>6} {'ms/page':>8} {'peak KB':>8} {'image MB copied':>16}")
+    for name, data in docs:
+        doc = fitz.open(stream=data, filetype="pdf")
+        for label, flags in (("default", fitz.TEXTFLAGS_RAWDICT), ("lean", TEXT_FLAGS)):
+            per_page, peak, image_bytes = _measure(doc, flags)
+            print(f"{name:<28} {label:>6} {per_page * 1e3:>8.2f} {peak / 1024:>8.0f} {image_bytes / 1e6:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# bench/bench_geometry.py
+# 글자 geometry: 글자별 dict (이전 방식) vs 라인 문자열 + float32 (n, 4) 배열 (현재 방식)
+# 페이지당 시간과 배치 동안 유지되는 라인 구조 크기(tracemalloc) 비교. Kiwi 분석과 get_text("rawdict") 는 미리 해 두고
+# 측정에서 뺀다 (두 방식 모두 같은 rawdict 를 읽으므로 차이는 그 뒤 geometry 처리에서만 난다).
+#   python -m bench.bench_geometry [--pages 50]
+import argparse, time, tracemalloc
+import fitz  # PyMuPDF
+
+from engine.mask_engine import DEFAULTS, TEXT_FLAGS, _lines_from_rawdict, _rects_from_ranges, _spans_for_texts
+from bench.synth import make_pdf
+
+
+# ---- 이전 방식 (비교용 사본) ----
+def _collect_line_chars(line):
+    out = []
+    for span in line.get("spans", []):
+        for ch in span.get("chars") or []:
+            out.append({"char": ch["c"], "bbox": ch["bbox"]})
+    return out
+
+def _rect_from_char_range(line_chars, s, e):
+    x0 = y0 = 1e9; x1 = y1 = -1e9
+    for idx in range(s, e):
+        if 0 <= idx < len(line_chars):
+            bx0, by0, bx1, by1 = line_chars[idx]["bbox"]
+            x0 = min(x0, bx0); y0 = min(y0, by0)
+            x1 = max(x1, bx1); y1 = max(y1, by1)
+    return fitz.Rect(x0, y0, x1, y1) if x1 > x0 and y1 > y0 else None
+
+def _dict_page(page, spans_of):
+    lines = []
+    for block in page.get_text("rawdict").get("blocks", []):
+        if block.get("type") != 0: continue
+        for line in block.get("lines", []):
+            line_chars = _collect_line_chars(line)
+            if not line_chars: continue
+            line_text = "".join(ch["char"] for ch in line_chars)
+            if not line_text.strip(): continue
+            lines.append((line_chars, line_text))
+    rects = []
+    for line_chars, line_text in lines:
+        for s, e in spans_of[line_text]:
+            r = _rect_from_char_range(line_chars, s, e)
+            if r: rects.append(r)
+    return lines, rects
+
+
+# ---- 현재 방식 ----
+def _columnar_page(page, spans_of):
+    pt = _lines_from_rawdict(page.get_text("rawdict"))
+    ranges = [(off + s, off + e) for text, off in zip(pt.texts, pt.starts) for s, e in spans_of[text]]
+    boxes, valid = _rects_from_ranges(pt.bboxes, ranges)
+    return pt, [fitz.Rect(b) for b in boxes[valid].tolist()]
+
+
+class _RawPage:
+    # get_text("rawdict") 결과를 미리 들고 있는 페이지 대역 (엔진과 같은 추출 플래그)
+    def __init__(self, page): self.raw = page.get_text("rawdict", flags=TEXT_FLAGS)
+    def get_text(self, *args, **kwargs): return self.raw
+
+
+def _measure(fn, pages, spans_of):
+    """페이지당 시간, 그리고 배치(batch_pages) 동안 붙잡고 있는 라인 구조의 페이지당 크기"""
+    t = time.perf_counter()
+    for page in pages: fn(page, spans_of)
+    elapsed = time.perf_counter() - t
+    tracemalloc.start()
+    kept = [fn(page, spans_of)[0] for page in pages]
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return elapsed / len(pages), retained / len(pages)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=50)
+    args = ap.parse_args()
+
+    docs = [("sample_data/test_1.pdf", open("sample_data/test_1.pdf", "rb").read()),
+            ("sample_data/test_2.pdf", open("sample_data/test_2.pdf", "rb").read()),
+            (f"synthetic {args.pages}p", make_pdf(pages=args.pages))]
+    key = (DEFAULTS["target_mode"], DEFAULTS["allow_noun_span"], DEFAULTS["min_mask_len"],
+           frozenset(DEFAULTS["nounish_include"]), frozenset(DEFAULTS["josa_set"]))
+    print(f"{'document':<24} {'dict ms/page':>13} {'array ms/page':>14} {'dict KB/page':>13} {'array KB/page':>14}")
+    for name, data in docs:
+        doc = fitz.open(stream=data, filetype="pdf")
+        pages = [_RawPage(p) for p in doc]
+        texts = sorted({t for page in pages for t in _lines_from_rawdict(page.raw).texts})
+        spans_of = dict(zip(texts, _spans_for_texts(texts, key, use_cache=False)))
+        assert [_dict_page(p, spans_of)[1] for p in pages] == [_columnar_page(p, spans_of)[1] for p in pages]
+        d_t, d_m = _measure(_dict_page, pages, spans_of)
+        c_t, c_m = _measure(_columnar_page, pages, spans_of)
+        print(f"{name:<24} {d_t * 1e3:>13.2f} {c_t * 1e3:>14.2f} {d_m / 1024:>13.0f} {c_m / 1024:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
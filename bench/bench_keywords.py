@@ -0,0 +1,51 @@
+# bench/bench_keywords.py
+# target_mode=keywords: 단어마다 str.find vs Aho-Corasick 오토마톤 한 번 훑기
+#   python -m bench.bench_keywords [--pages 50 --terms 100 1000 10000 100000]
+import argparse, random, time
+import fitz  # PyMuPDF
+
+from engine.keywords import KeywordMatcher
+from engine.mask_engine import _extract_lines
+from bench.synth import _WORDS, make_pdf
+
+_SYLLABLES = [chr(c) for c in range(0xAC00, 0xAC00 + 400)]
+
+
+def _terms(n, rng):
+    # 실제 문서에 나오는 단어 몇 개 + 나머지는 임의의 2~6 음절 (이름/코드 목록 흉내)
+    terms = set(_WORDS[:5])
+    while len(terms) < n: terms.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 6))))
+    return list(terms)
+
+
+def _naive(texts, terms):
+    hits = 0
+    for text in texts:
+        for t in terms:
+            i = text.find(t)
+            while i >= 0:
+                hits += 1; i = text.find(t, i + 1)
+    return hits
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=50)
+    ap.add_argument("--terms", type=int, nargs="*", default=[100, 1000, 10000, 100000])
+    args = ap.parse_args()
+
+    src = fitz.open(stream=make_pdf(pages=args.pages), filetype="pdf")
+    texts = [text for page in src for text in _extract_lines(page).texts]
+    rng = random.Random(0)
+    print(f"{len(texts)} lines ({args.pages} pages)")
+    print(f"{'terms':>7} {'build s':>8} {'per-term s':>11} {'automaton s':>12} {'speedup':>8}")
+    for n in args.terms:
+        terms = _terms(n, rng)
+        t = time.perf_counter(); matcher = KeywordMatcher(terms); build = time.perf_counter() - t
+        t = time.perf_counter(); [matcher.find(x) for x in texts]; scan = time.perf_counter() - t
+        t = time.perf_counter(); _naive(texts, terms); naive = time.perf_counter() - t
+        print(f"{n:>7} {build:>8.2f} {naive:>11.3f} {scan:>12.3f} {naive / scan:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
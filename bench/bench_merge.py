@@ -0,0 +1,62 @@
+# bench/bench_merge.py
+# rect 병합: 후보마다 fitz.Rect + 병합 (이전 방식) vs (n, 4) 배열 병합 후 결과만 Rect (현재 방식)
+# 표가 많은 조밀한 페이지 가정
+#   python -m bench.bench_merge [--sizes 100 1000 5000]
+import argparse, random, time
+import numpy as np
+import fitz  # PyMuPDF
+
+from engine.mask_engine import _merge_boxes
+
+
+def _merge_rects(rects, x_gap=0.5, y_gap=0.12):
+    # 이전 구현 (비교용 사본)
+    if not rects: return []
+    rects = sorted(rects, key=lambda r: (round((r.y0+r.y1)/2, 2), r.x0))
+    merged, cur = [], rects[0]
+    for r in rects[1:]:
+        same_line = abs((r.y0+r.y1)/2 - (cur.y0+cur.y1)/2) <= y_gap * max(1.0, (cur.height + r.height)/2)
+        close_h   = r.x0 <= cur.x1 + x_gap
+        if same_line and close_h:
+            cur = fitz.Rect(min(cur.x0, r.x0), min(cur.y0, r.y0), max(cur.x1, r.x1), max(cur.y1, r.y1))
+        else:
+            merged.append(cur); cur = r
+    merged.append(cur)
+    return merged
+
+
+def _table_boxes(n, seed=0):
+    # 셀 단위 후보: 행 높이 12pt, 열 폭 60pt, 셀 안에 1~3개 단어
+    rng = random.Random(seed)
+    out = []
+    while len(out) < n:
+        row, col = rng.randrange(60), rng.randrange(9)
+        x0 = 30 + col * 60 + rng.uniform(0, 35); y0 = 40 + row * 12
+        out.append([x0, y0, x0 + rng.uniform(6, 24), y0 + 10])
+    return np.array(out, dtype=np.float32)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    print(f"{'rects':>7} {'Rect list ms':>13} {'array ms':>9} {'speedup':>8}")
+    for n in args.sizes:
+        boxes = _table_boxes(n)
+        t = time.perf_counter()
+        for _ in range(args.repeat):  # 이전 파이프라인은 후보마다 Rect 를 만들었다
+            old = _merge_rects([fitz.Rect(b) for b in boxes.tolist()])
+        t_old = (time.perf_counter() - t) / args.repeat
+        t = time.perf_counter()
+        for _ in range(args.repeat):
+            merged, _ = _merge_boxes(boxes)
+            new = [fitz.Rect(r) for r in merged.tolist()]  # 마지막에 한 번만 Rect 생성
+        t_new = (time.perf_counter() - t) / args.repeat
+        assert [tuple(r) for r in old] == [tuple(r) for r in new]
+        print(f"{n:>7} {t_old * 1e3:>13.2f} {t_new * 1e3:>9.2f} {t_old / t_new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
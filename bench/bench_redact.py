@@ -0,0 +1,50 @@
+# bench/bench_redact.py
+# redact 프로필별 페이지 렌더링 시간 (형태소 분석은 한 번만 하고 마스킹 그리기 단계만 잰다)
+#   python -m bench.bench_redact [--pages 5 --repeat 3]
+import argparse, random, time
+import fitz  # PyMuPDF
+
+from engine.mask_engine import DEFAULTS, REDACT_PROFILES, _analyze_pages, _mark_page
+from bench.synth import make_pdf, _noise_image
+
+
+def _scanned(pages):
+    # 본문 아래에 페이지 전체 크기 이미지(200dpi)를 깐 문서 (스캔 배경/워터마크 흉내) → 모든 마스킹 rect 가 이미지 위에 있다
+    doc = fitz.open(stream=make_pdf(pages=pages, lines_per_page=40), filetype="pdf")
+    rng = random.Random(0)
+    for page in doc: page.insert_image(page.rect, pixmap=_noise_image(rng, 1650, 2340), overlay=False)
+    return doc.tobytes(garbage=4, deflate=True)
+
+
+def _measure(data, plan, cfg, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        doc = fitz.open(stream=data, filetype="pdf")
+        t = time.perf_counter()
+        for pno, rects in plan: _mark_page(doc[pno], pno, rects, cfg)
+        best = min(best, time.perf_counter() - t)
+        doc.close()
+    return best / len(plan)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=5, help="합성 문서 페이지 수")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    docs = [("sample_data/test_1.pdf", open("sample_data/test_1.pdf", "rb").read()),
+            ("sample_data/test_2.pdf", open("sample_data/test_2.pdf", "rb").read()),
+            (f"synthetic {args.pages}p bg image", _scanned(args.pages))]
+    print(f"{'document':<26} {'profile':>10} {'ms/page':>8}")
+    for name, data in docs:
+        cfg = DEFAULTS.copy(); cfg.update(mode="redact", seed=0)
+        src = fitz.open(stream=data, filetype="pdf")
+        plan = [(pno, rects) for pno, rects, _ in _analyze_pages(src, 0, len(src), cfg)]
+        for profile in REDACT_PROFILES:
+            cfg["redact_profile"] = profile
+            print(f"{name:<26} {profile:>10} {_measure(data, plan, cfg, args.repeat) * 1e3:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
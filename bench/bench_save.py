@@ -0,0 +1,42 @@
+# bench/bench_save.py
+# 결과 저장 프로필별 end-to-end 시간 / 저장 단계 시간 / 출력 크기
+#   python -m bench.bench_save [--pages 60 --images 2 --repeat 3]
+# mask_pdf_bytes 전체를 잰다 (span 캐시는 꺼서 매번 같은 일을 하게). 저장 단계 = 구간 PDF 만들기 + 최종 저장 (MaskStats "save")
+import argparse, time
+
+from engine.mask_engine import SAVE_PROFILES, mask_pdf_bytes, warmup
+from engine.stats import MaskStats
+from bench.synth import make_pdf
+
+
+def _measure(data, profile, repeat):
+    wall = save = float("inf"); size = 0
+    for _ in range(repeat):
+        stats = MaskStats()
+        t = time.perf_counter()
+        out = mask_pdf_bytes(data, seed=0, save_profile=profile, span_cache=False, stats=stats)
+        wall = min(wall, time.perf_counter() - t)
+        save = min(save, stats.as_dict()["timers"]["save"]); size = len(out)
+    return wall, save, size
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=60)
+    ap.add_argument("--images", type=int, default=2, help="합성 문서의 페이지당 이미지 수")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    docs = [("sample_data/test_1.pdf", open("sample_data/test_1.pdf", "rb").read()),
+            ("sample_data/test_2.pdf", open("sample_data/test_2.pdf", "rb").read()),
+            (f"synthetic {args.pages}p x{args.images}img", make_pdf(pages=args.pages, lines_per_page=20, images=args.images))]
+    warmup()
+    print(f"{'document':<28} {'profile':>9} {'total s':>8} {'save ms':>8} {'size KB':>9}")
+    for name, data in docs:
+        for profile in SAVE_PROFILES:
+            wall, save, size = _measure(data, profile, args.repeat)
+            print(f"{name:<28} {profile:>9} {wall:>8.2f} {save * 1e3:>8.1f} {size / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# bench/bench_span_cache.py
+# tokenize + span 계산 시간: 라인별 tokenize (원래 경로) / 배치 tokenize (캐시 도입 전) / 배치 + 라인 span 캐시
+#   python -m bench.bench_span_cache [--pages 100 --docs 10]
+# 캐시는 프로세스 전역이므로 같은 양식의 문서가 이어서 들어오면 (--docs 개) 앞 문서에서 본 라인을 재사용한다.
+import argparse, time
+import fitz  # PyMuPDF
+
+from engine.mask_engine import DEFAULTS, _extract_lines, _kiwi, _line_spans, _spans_for_texts, _tokenize_lines
+from engine.span_cache import SPAN_CACHE
+from bench.synth import make_pdf
+
+_KEY = (DEFAULTS["target_mode"], DEFAULTS["allow_noun_span"], DEFAULTS["min_mask_len"],
+        frozenset(DEFAULTS["nounish_include"]), frozenset(DEFAULTS["josa_set"]))
+
+
+def _batches(pdf_bytes, batch_pages):
+    src = fitz.open(stream=pdf_bytes, filetype="pdf")
+    pages = [_extract_lines(page).texts for page in src]
+    src.close()
+    return [sum(pages[i:i + batch_pages], []) for i in range(0, len(pages), batch_pages)]
+
+
+def _spans(texts, token_lists):
+    target_mode, allow_span, min_len, include, josa_set = _KEY
+    return [_line_spans(t, target_mode, josa_set, allow_span, min_len, include) for t in token_lists]
+
+
+def _per_line(docs):
+    for batches in docs:
+        for texts in batches: _spans(texts, [_kiwi().tokenize(x) for x in texts])
+
+
+def _batched(docs):
+    for batches in docs:
+        for texts in batches: _spans(texts, _tokenize_lines(texts))
+
+
+def _cached(docs):
+    SPAN_CACHE.clear()
+    for batches in docs:
+        for texts in batches: _spans_for_texts(texts, _KEY)
+
+
+def _time(fn, docs, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter(); fn(docs); best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=100)
+    ap.add_argument("--docs", type=int, default=10, help="같은 양식 문서 수 (양식 코퍼스)")
+    ap.add_argument("--repeat", type=int, default=3, help="반복 횟수 (가장 빠른 값)")
+    args = ap.parse_args()
+
+    read = lambda path: open(path, "rb").read()
+    corpora = [
+        ("test_1.pdf", [read("sample_data/test_1.pdf")]),
+        ("test_2.pdf", [read("sample_data/test_2.pdf")]),
+        (f"synthetic {args.pages}p headers", [make_pdf(pages=args.pages, lines_per_page=20, headers=True)]),
+        (f"forms {args.docs}x10p 30% boilerplate",
+         [make_pdf(pages=10, lines_per_page=20, headers=True, boilerplate=0.3, seed=i) for i in range(args.docs)]),
+    ]
+    _tokenize_lines(["워밍업 문장입니다"] * 8)
+    print(f"{'corpus':<32} {'lines':>6} {'unique':>7} {'per-line s':>10} {'batched s':>10} {'cache s':>8} "
+          f"{'vs batched':>10} {'vs per-line':>11} {'hit rate':>9}")
+    for name, pdfs in corpora:
+        docs = [_batches(pdf, DEFAULTS["batch_pages"]) for pdf in pdfs]
+        lines = [t for batches in docs for texts in batches for t in texts]
+        per_line, batched, cached = _time(_per_line, docs, args.repeat), _time(_batched, docs, args.repeat), _time(_cached, docs, args.repeat)
+        st = SPAN_CACHE.stats()  # 마지막 반복 (빈 캐시에서 시작) 의 hit rate
+        print(f"{name:<32} {len(lines):>6} {len(set(lines)) / len(lines):>7.1%} {per_line:>10.2f} {batched:>10.2f} "
+              f"{cached:>8.2f} {1 - cached / batched:>10.1%} {1 - cached / per_line:>11.1%} {st['hit_rate']:>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
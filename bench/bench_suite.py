@@ -0,0 +1,100 @@
+# bench/bench_suite.py
+# 엔진 전체 벤치마크: 문서마다 별도 프로세스에서 처음부터 끝까지 mask_pdf_file → pages/sec, peak RSS,
+#   그리고 같은 실행의 MaskStats (engine/stats.py) 단계별 시간 (get_text / tokenize / spans / merge / redact / save)
+#   python -m bench.bench_suite [--sizes 10 100 1000 --tables 1 --images 1 --headers --json result.json]
+# 프로세스를 나누므로 RSS 가 앞 문서의 영향을 받지 않는다. --workers N 이면 단계 시간은 워커별 값을 합친 것.
+import argparse, json, os, platform, resource, subprocess, sys, tempfile, time
+
+from engine.stats import STAGES
+
+
+def _rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KB
+
+
+def _child(path, opts, stages):
+    """자식 프로세스: 결과 JSON 한 줄을 stdout 에 쓴다"""
+    import fitz
+    from engine.mask_engine import mask_pdf_file, warmup
+    from engine.stats import MaskStats
+    with fitz.open(path) as doc: pages = len(doc)
+    warmup(opts.get("workers", 0))  # Kiwi 는 lazy → 모델 로드 / 첫 토큰화를 측정에서 빼고 서버의 워밍업 끝난 워커와 같은 상태에서
+    rss_base = _rss_mb()  # Kiwi 까지 올라온 상태
+    stats = MaskStats() if stages else None
+    fd, dst = tempfile.mkstemp(suffix=".pdf"); os.close(fd)
+    try:
+        t = time.perf_counter()
+        mask_pdf_file(path, dst, stats=stats, **opts)
+        elapsed = time.perf_counter() - t
+        result = {"pages": pages, "input_bytes": os.path.getsize(path), "output_bytes": os.path.getsize(dst),
+                  "seconds": round(elapsed, 3), "pages_per_sec": round(pages / elapsed, 2),
+                  "rss_base_mb": round(rss_base, 1), "rss_peak_mb": round(_rss_mb(), 1)}
+    finally:
+        os.remove(dst)
+    if stats is not None:
+        result["stages"] = {k: round(stats.timers.get(k, 0.0), 4) for k in STAGES}
+        result["counts"] = stats.counters
+    print(json.dumps(result))
+
+
+def _run(path, opts, stages):
+    cmd = [sys.executable, "-m", "bench.bench_suite", "--child", path, "--opts", json.dumps(opts)]
+    if not stages: cmd.append("--no-stages")
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--samples", nargs="*", default=["sample_data/test_1.pdf", "sample_data/test_2.pdf"])
+    ap.add_argument("--sizes", nargs="*", type=int, default=[10, 100, 1000], help="합성 문서 페이지 수")
+    ap.add_argument("--lines", type=int, default=40, help="합성 문서 페이지당 줄 수")
+    ap.add_argument("--tables", type=int, default=1)
+    ap.add_argument("--images", type=int, default=0)
+    ap.add_argument("--headers", action="store_true")
+    ap.add_argument("--mode", default="redact", choices=("redact", "highlight"))
+    ap.add_argument("--workers", type=int, default=0)
+    ap.add_argument("--no-stages", action="store_true", help="단계별 시간 측정 생략")
+    ap.add_argument("--json", metavar="PATH", help="결과 JSON 저장 경로 (- 는 stdout)")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    ap.add_argument("--opts", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        _child(args.child, json.loads(args.opts), not args.no_stages)
+        return
+
+    from bench.synth import make_pdf
+    opts = {"mode": args.mode, "workers": args.workers, "seed": 0}
+    synth = {"lines_per_page": args.lines, "tables": args.tables, "images": args.images, "headers": args.headers}
+    report = {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+              "options": opts, "synthetic": synth, "documents": []}
+    log = sys.stderr if args.json == "-" else sys.stdout
+    print(f"{'document':<24} {'pages':>6} {'pages/s':>8} {'RSS MB':>7}  " + " ".join(f"{s:>8}" for s in STAGES), file=log, flush=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        docs = [(p, p) for p in args.samples]
+        for n in args.sizes:
+            path = os.path.join(tmp, f"synthetic_{n}.pdf")
+            with open(path, "wb") as f: f.write(make_pdf(pages=n, **synth))
+            docs.append((f"synthetic {n}p", path))
+        for name, path in docs:
+            result = dict(_run(path, opts, not args.no_stages), document=name)
+            report["documents"].append(result)
+            if "error" in result:
+                print(f"{name:<24} error: {result['error']}", file=log, flush=True)
+                continue
+            st = result.get("stages", {})
+            print(f"{name:<24} {result['pages']:>6} {result['pages_per_sec']:>8.1f} {result['rss_peak_mb']:>7.0f}  "
+                  + " ".join(f"{st[s]:>8.2f}" if s in st else f"{'-':>8}" for s in STAGES), file=log, flush=True)
+
+    if args.json == "-":
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    elif args.json:
+        with open(args.json, "w", encoding="utf-8") as f: json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
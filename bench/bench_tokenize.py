@@ -0,0 +1,43 @@
+# bench/bench_tokenize.py
+# 라인별 tokenize 호출 vs 문서 단위 배치 tokenize 처리량 비교
+#   python -m bench.bench_tokenize [--pages 200]
+import argparse, time
+import fitz  # PyMuPDF
+
+from engine.mask_engine import _extract_lines, _kiwi, _tokenize_lines
+from bench.synth import make_pdf
+
+
+def _collect_texts(pdf_bytes):
+    src = fitz.open(stream=pdf_bytes, filetype="pdf")
+    texts = [text for page in src for text in _extract_lines(page).texts]
+    src.close()
+    return texts
+
+
+def _bench(name, texts, repeat):
+    _tokenize_lines(texts[:32])  # warmup
+    t = time.perf_counter()
+    for _ in range(repeat): [_kiwi().tokenize(x) for x in texts]
+    per_line = (time.perf_counter() - t) / repeat
+    t = time.perf_counter()
+    for _ in range(repeat): _tokenize_lines(texts)
+    batched = (time.perf_counter() - t) / repeat
+    print(f"{name:<24} {len(texts):>7} {len(texts)/per_line:>12.0f} {len(texts)/batched:>12.0f} {per_line/batched:>7.2f}x")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'document':<24} {'lines':>7} {'per-line/s':>12} {'batched/s':>12} {'speedup':>8}")
+    for path in ("sample_data/test_1.pdf", "sample_data/test_2.pdf"):
+        with open(path, "rb") as f:
+            _bench(path, _collect_texts(f.read()), args.repeat)
+    _bench(f"synthetic {args.pages}p", _collect_texts(make_pdf(pages=args.pages)), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# bench/synth.py
+# 벤치마크용 합성 한국어 PDF 생성기
+#   python -m bench.synth --pages 100 --tables 1 --images 1 --headers -o synthetic.pdf
+import argparse, random
+import fitz  # PyMuPDF
+
+_WORDS = [
+    "계약", "당사자", "조항", "학생", "교수", "과제", "시험", "운영체제", "스케줄링", "자원",
+    "처리기", "스레드", "메모리", "프로세스", "보고서", "제출", "기한", "회사", "고객", "제품",
+]
+_JOSA = ["은", "는", "이", "가", "을", "를", "에", "에서", "에게", "으로", "와", "과", "도", "만"]
+_VERBS = ["적용된다", "할당한다", "선택하였다", "확인한다", "포함된다", "처리한다"]
+
+
+def make_sentence(rng, n_words=6):
+    parts = [rng.choice(_WORDS) + rng.choice(_JOSA) for _ in range(n_words)]
+    return " ".join(parts) + " " + rng.choice(_VERBS) + "."
+
+
+HEADER = "주식회사 예시 표준 계약서 - 대외비 문서로서 무단 배포를 금지함"
+# 양식/시험지에서 문서마다 그대로 반복되는 문구 (boilerplate 비율만큼 본문 줄을 여기서 뽑는다)
+BOILERPLATE = [
+    "다음 글을 읽고 물음에 답하시오.", "다음 중 옳은 것을 모두 고른 것은?", "다음 중 옳지 않은 것은?",
+    "※ 답안지에 성명과 수험번호를 정확히 기재하시오.", "제1조 (목적) 이 계약은 당사자 간의 권리와 의무를 정함을 목적으로 한다.",
+    "제2조 (정의) 이 계약에서 사용하는 용어의 뜻은 다음과 같다.", "갑과 을은 신의에 따라 성실히 계약을 이행한다.",
+    "본 문서는 관계자 외 열람을 금지한다.", "위 내용을 확인하였으며 이에 서명한다.", "① 가, 나   ② 가, 다   ③ 나, 다   ④ 가, 나, 다",
+    "보기의 설명 중 알맞은 것을 고르시오.", "아래 표를 참고하여 물음에 답하시오.",
+]
+
+
+def _noise_image(rng, w, h):
+    # 압축이 거의 안 되는 RGB 노이즈 (스캔/사진 페이지 흉내)
+    return fitz.Pixmap(fitz.csRGB, w, h, rng.randbytes(w * h * 3), 0)
+
+
+def _table(page, rng, y, rows=5, cols=4, x0=50, width=330, row_h=18):
+    # 격자 선 + 칸마다 짧은 어절 (표 안 텍스트는 라인이 잘게 쪼개진다). 표 아래 y 를 반환
+    col_w = width / cols
+    shape = page.new_shape()
+    for r in range(rows + 1): shape.draw_line((x0, y + r * row_h), (x0 + width, y + r * row_h))
+    for c in range(cols + 1): shape.draw_line((x0 + c * col_w, y), (x0 + c * col_w, y + rows * row_h))
+    shape.finish(color=(0, 0, 0), width=0.5)
+    shape.commit()
+    for r in range(rows):
+        for c in range(cols):
+            cell = f"{rng.randint(1, 999):,}" if c == cols - 1 and r else rng.choice(_WORDS) + rng.choice(_JOSA)
+            page.insert_text((x0 + c * col_w + 4, y + r * row_h + 13), cell, fontname="korea", fontsize=9)
+    return y + rows * row_h + 12
+
+
+def make_pdf(pages=10, lines_per_page=40, seed=0, headers=False, images=0, tables=0, boilerplate=0.0) -> bytes:
+    rng = random.Random(seed)
+    doc = fitz.open()
+    # 표는 본문 사이사이에 고르게 (페이지마다 tables 개)
+    table_at = {lines_per_page * (k + 1) // (tables + 1) for k in range(tables)}
+    for pno in range(pages):
+        page = doc.new_page()
+        if headers:  # 매 페이지 반복되는 머리말/꼬리말
+            page.insert_text((50, 36), HEADER, fontname="korea", fontsize=9)
+            page.insert_text((page.rect.width / 2, page.rect.height - 24), f"- {pno + 1} -", fontname="korea", fontsize=9)
+        for k in range(images):  # 페이지마다 이미지 images 장 (본문 오른쪽 여백에 세로로)
+            box = fitz.Rect(400, 60 + k * 110, 560, 160 + k * 110)
+            page.insert_image(box, pixmap=_noise_image(rng, 320, 200))
+        y = 60
+        for i in range(lines_per_page):
+            if i in table_at and y < page.rect.height - 150: y = _table(page, rng, y)
+            text = rng.choice(BOILERPLATE) if rng.random() < boilerplate else make_sentence(rng)
+            page.insert_text((50, y), text, fontname="korea", fontsize=10)
+            y += 18
+            if y > page.rect.height - 40: break
+    data = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return data
+
+
+def main():
+    ap = argparse.ArgumentParser(description="합성 한국어 PDF 생성")
+    ap.add_argument("--pages", type=int, default=10)
+    ap.add_argument("--lines", type=int, default=40, help="페이지당 본문 줄 수")
+    ap.add_argument("--tables", type=int, default=0, help="페이지당 표 수")
+    ap.add_argument("--images", type=int, default=0, help="페이지당 이미지 수")
+    ap.add_argument("--headers", action="store_true", help="매 페이지 반복되는 머리말/꼬리말")
+    ap.add_argument("--boilerplate", type=float, default=0.0, help="양식 문구로 채울 본문 줄 비율 (0.0 ~ 1.0)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("-o", "--output", default="synthetic.pdf")
+    args = ap.parse_args()
+    data = make_pdf(pages=args.pages, lines_per_page=args.lines, seed=args.seed,
+                    headers=args.headers, images=args.images, tables=args.tables, boilerplate=args.boilerplate)
+    with open(args.output, "wb") as f: f.write(data)
+    print(f"{args.output}: {args.pages} pages, {len(data) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# engine/__main__.py
+# 커맨드라인 마스킹 (스트리밍 모드 → 페이지 수와 상관없이 메모리 사용량 일정)
+#   python -m engine input.pdf output.pdf [--mode highlight] [--workers 8] ...
+import argparse, sys
+
+from engine.mask_engine import DEFAULTS, LAYOUTS, REDACT_PROFILES, SAVE_PROFILES, mask_pdf_to
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m engine", description="PDF 명사/조사 마스킹")
+    ap.add_argument("input", help="입력 PDF 경로")
+    ap.add_argument("output", help="출력 PDF 경로 ('-' 이면 stdout)")
+    ap.add_argument("--mode", choices=["redact", "highlight"], default=DEFAULTS["mode"])
+    ap.add_argument("--target-mode", choices=["both", "josa_only", "nouns_only", "keywords"], default=DEFAULTS["target_mode"])
+    ap.add_argument("--keywords", help="target-mode keywords 의 단어 목록 파일 (UTF-8, 한 줄에 하나)")
+    ap.add_argument("--mask-ratio", type=float, default=DEFAULTS["mask_ratio"])
+    ap.add_argument("--min-mask-len", type=int, default=DEFAULTS["min_mask_len"])
+    ap.add_argument("--no-noun-span", action="store_true", help="연속 명사를 한 덩어리로 묶지 않음")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--workers", type=int, default=DEFAULTS["workers"])
+    ap.add_argument("--chunk-pages", type=int, default=DEFAULTS["chunk_pages"])
+    ap.add_argument("--layout", choices=LAYOUTS, default=DEFAULTS["layout"])
+    ap.add_argument("--redact-profile", choices=list(REDACT_PROFILES), default=DEFAULTS["redact_profile"])
+    ap.add_argument("--save-profile", choices=list(SAVE_PROFILES), default=DEFAULTS["save_profile"])
+    args = ap.parse_args(argv)
+
+    opts = {
+        "mode": args.mode,
+        "target_mode": args.target_mode,
+        "keywords": args.keywords,
+        "mask_ratio": args.mask_ratio,
+        "min_mask_len": args.min_mask_len,
+        "allow_noun_span": not args.no_noun_span,
+        "seed": args.seed,
+        "workers": args.workers,
+        "chunk_pages": args.chunk_pages,
+        "save_profile": args.save_profile,
+        "layout": args.layout,
+        "redact_profile": args.redact_profile,
+    }
+    if args.output == "-":
+        mask_pdf_to(args.input, sys.stdout.buffer, **opts)
+    else:
+        with open(args.output, "wb") as f:
+            mask_pdf_to(args.input, f, **opts)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+# engine/concurrency.py
+# CPU 예산: 쓸 수 있는 코어를 gunicorn 워커 / 워커 안의 Kiwi 스레드 / 페이지(파일) 프로세스 풀에 나눠 준다.
+# 셋이 각자 머신 전체 코어 수에 맞추면 (워커 3개 × Kiwi(num_workers=-1) × 풀) 코어보다 훨씬 많은 스레드가 돌며 문맥 전환만 늘어난다.
+# 워커와 풀 프로세스는 저마다 Kiwi 를 올리므로 (약 580MB) 기본 프로세스 수는 메모리로도 제한한다.
+#   코어 수 = sched_getaffinity ∩ cgroup CPU 쿼터 (v2 cpu.max / v1 cpu.cfs_quota_us, 올림)
+#   메모리 = /proc/meminfo MemAvailable ∩ cgroup 메모리 제한 (v2 memory.max / v1 memory.limit_in_bytes)
+#   환경변수: MASK_CPUS, MASK_HTTP_WORKERS (없으면 WEB_CONCURRENCY), MASK_KIWI_THREADS, MASK_PAGE_WORKERS,
+#            MASK_MEMORY_MB, MASK_PROCESS_MB
+#   python -m engine.concurrency    # 이 환경에서 계산된 예산 출력
+import collections, functools, math, os
+
+Budget = collections.namedtuple("Budget", "cpus http_workers kiwi_threads page_workers page_kiwi_threads "
+                                           "memory_mb process_mb source")
+# 프로세스(워커 / 풀 프로세스) 하나의 예상 메모리 MB. Kiwi 를 올리면 peak RSS 약 580MB (bench_suite),
+# 토크나이저 데몬(MASK_TOKENIZER_SOCKET)을 쓰면 약 140MB (README "공유 토크나이저 데몬")
+PROCESS_MB = {"kiwi": 600, "tokenizer_daemon": 150}
+
+
+def _read(path):
+    try:
+        with open(path) as f: return f.read().strip()
+    except OSError:
+        return None
+
+
+def _cgroup_paths(proc_cgroup, controller="cpu"):
+    # /proc/self/cgroup: "0::/a/b" (v2) 또는 "4:cpu,cpuacct:/a/b" (v1). 컨테이너 안에서는 보통 "/"
+    v2, v1 = "/", "/"
+    for line in (_read(proc_cgroup) or "").splitlines():
+        hid, controllers, path = line.split(":", 2)
+        if hid == "0" and not controllers: v2 = path
+        elif controller in controllers.split(","): v1 = path
+    return v2, v1
+
+
+def cgroup_cpu_limit(root="/sys/fs/cgroup", proc_cgroup="/proc/self/cgroup"):
+    """cgroup CPU 쿼터 (코어 수, 소수 가능). 제한이 없으면 None"""
+    v2, v1 = _cgroup_paths(proc_cgroup)
+    for base in dict.fromkeys((os.path.normpath(root + v2), root)):
+        text = _read(os.path.join(base, "cpu.max"))  # "max 100000" | "150000 100000"
+        if text:
+            quota, period = text.split()[:2]
+            return None if quota == "max" else int(quota) / int(period)
+    for name in ("cpu", "cpu,cpuacct", "cpuacct,cpu"):
+        for base in dict.fromkeys((os.path.normpath(os.path.join(root, name) + v1), os.path.join(root, name))):
+            quota, period = _read(os.path.join(base, "cpu.cfs_quota_us")), _read(os.path.join(base, "cpu.cfs_period_us"))
+            if quota and period:
+                return None if int(quota) <= 0 else int(quota) / int(period)
+    return None
+
+
+def cgroup_memory_limit(root="/sys/fs/cgroup", proc_cgroup="/proc/self/cgroup"):
+    """cgroup 메모리 제한 (바이트). 제한이 없으면 None"""
+    v2, v1 = _cgroup_paths(proc_cgroup, "memory")
+    for base in dict.fromkeys((os.path.normpath(root + v2), root)):
+        text = _read(os.path.join(base, "memory.max"))  # "max" | "4294967296"
+        if text:
+            return None if text == "max" else int(text)
+    for base in dict.fromkeys((os.path.normpath(os.path.join(root, "memory") + v1), os.path.join(root, "memory"))):
+        text = _read(os.path.join(base, "memory.limit_in_bytes"))
+        if text:
+            return None if int(text) >= 1 << 60 else int(text)  # 제한 없음 = 페이지 단위로 내린 int64 최댓값
+    return None
+
+
+def available_memory_mb(meminfo="/proc/meminfo"):
+    """지금 쓸 수 있는 메모리 MB (MemAvailable 과 cgroup 제한 중 작은 쪽). 알 수 없으면 None"""
+    sizes = []
+    for line in (_read(meminfo) or "").splitlines():
+        if line.startswith("MemAvailable:"): sizes.append(int(line.split()[1]) * 1024)
+    limit = cgroup_memory_limit()
+    if limit: sizes.append(limit)
+    return min(sizes) // (1024 * 1024) if sizes else None
+
+
+def available_cpus():
+    """이 프로세스가 실제로 쓸 수 있는 코어 수 (affinity 와 cgroup 쿼터 중 작은 쪽, 최소 1)"""
+    n = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    limit = cgroup_cpu_limit()
+    if limit: n = min(n, math.ceil(limit))
+    return max(1, n)
+
+
+def _env_int(env, *names):
+    for name in names:
+        if env.get(name): return int(env[name])
+    return None
+
+
+def resolve(env=None, cpus=None, memory_mb=None):
+    """
+    기본 배분 (C = 코어 수, M = 메모리 MB, P = 프로세스 하나의 예상 메모리 MB, M // P = 띄울 수 있는 프로세스 수):
+      http_workers = min(max(2, C // 2), M // P)  느린 요청 하나가 /health 까지 막지 않도록 최소 2, 단 메모리가 허락하는 만큼만
+      kiwi_threads = C // http_workers            워커 하나 몫 (최소 1)
+      page_workers = 워커 몫이 2 이상일 때만 그만큼 (프로세스마다 Kiwi 를 따로 올리므로), 아니면 0 = 직렬.
+                     워커마다 풀을 하나씩 띄워도 M // P 를 넘지 않도록 줄이고, 2 보다 작아지면 0
+      page_kiwi_threads = 워커 몫 // page_workers  (풀을 쓰는 동안 워커 자신의 Kiwi 는 쉰다)
+    P 는 MASK_TOKENIZER_SOCKET 이 있으면 PROCESS_MB["tokenizer_daemon"], 아니면 PROCESS_MB["kiwi"].
+    환경변수로 직접 준 값은 메모리로 줄이지 않는다.
+    """
+    env = os.environ if env is None else env
+    overrides = {k: _env_int(env, *names) for k, names in (
+        ("cpus", ("MASK_CPUS",)), ("http_workers", ("MASK_HTTP_WORKERS", "WEB_CONCURRENCY")),
+        ("kiwi_threads", ("MASK_KIWI_THREADS",)), ("page_workers", ("MASK_PAGE_WORKERS",)),
+        ("memory_mb", ("MASK_MEMORY_MB",)), ("process_mb", ("MASK_PROCESS_MB",)))}
+    cpus = max(1, overrides["cpus"] or cpus or available_cpus())
+    memory = overrides["memory_mb"] or memory_mb or available_memory_mb()
+    per = overrides["process_mb"] or PROCESS_MB["tokenizer_daemon" if env.get("MASK_TOKENIZER_SOCKET") else "kiwi"]
+    fit = max(1, memory // per) if memory else None
+    http = overrides["http_workers"] or max(2, cpus // 2)
+    if fit and not overrides["http_workers"]: http = min(http, fit)
+    http = max(1, http)
+    share = max(1, cpus // http)
+    kiwi = max(1, overrides["kiwi_threads"] or share)
+    pages = overrides["page_workers"]
+    if pages is None:
+        pages = share if share >= 2 else 0
+        if fit: pages = min(pages, fit // http - 1)
+        if pages < 2: pages = 0
+    page_kiwi = max(1, share // max(1, pages))
+    source = ",".join(k for k, v in overrides.items() if v is not None) or "auto"
+    return Budget(cpus, http, kiwi, pages, page_kiwi, memory, per, source)
+
+
+@functools.lru_cache(maxsize=1)
+def budget() -> Budget:
+    """이 프로세스의 예산 (환경변수 기준, 한 번 계산). fork 된 자식은 다시 계산한다 (gunicorn post_fork 가 워커 수를 넘겨줌)"""
+    return resolve()
+
+
+os.register_at_fork(after_in_child=budget.cache_clear)
+
+
+def describe(b=None):
+    b = b or budget()
+    return (f"cpus={b.cpus} http_workers={b.http_workers} kiwi_threads={b.kiwi_threads} "
+            f"page_workers={b.page_workers} page_kiwi_threads={b.page_kiwi_threads} "
+            f"memory_mb={b.memory_mb} process_mb={b.process_mb} (source: {b.source})")
+
+
+if __name__ == "__main__":
+    print(f"cgroup limit: {cgroup_cpu_limit()}, affinity: "
+          f"{len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()}, "
+          f"memory: {available_memory_mb()}MB (cgroup limit: {cgroup_memory_limit()})")
+    print(describe())
@@ -0,0 +1,98 @@
+# engine/keywords.py
+# target_mode="keywords": 고객이 준 단어 목록(이름, 제품 코드, 과목 용어 ...)을 Aho-Corasick 오토마톤 하나로 묶어
+# 라인마다 한 번 훑어서 (길이에 비례) 모든 등장 위치를 찾는다. 단어 수가 10만 개여도 라인당 비용은 같다.
+# 오토마톤은 단어 목록마다 한 번만 만들고 프로세스 안에서 재사용한다 (LRU).
+import hashlib, os, threading
+from collections import OrderedDict
+
+_SHIFT = 21  # 유니코드 코드포인트는 21비트 → (상태 << 21) | 글자 를 전이 dict 의 키로 쓴다
+_CACHE_SIZE = 8
+
+
+class KeywordMatcher:
+    """
+    전이는 노드마다 dict 를 두지 않고 dict 하나에 int 키로 모은다 (10만 단어 = 수십만 노드에서 메모리 차이가 크다).
+    span 은 어차피 _dedup_spans 로 합치므로 위치마다 그 위치에서 끝나는 가장 긴 단어 하나만 내놓는다.
+    """
+    def __init__(self, terms):
+        terms = sorted({t for t in terms if t})
+        self.size = len(terms)
+        self.digest = hashlib.sha256("\n".join(terms).encode("utf-8")).hexdigest()
+        delta, best, levels = {}, [0], []
+        for term in terms:
+            s = 0
+            for depth, ch in enumerate(term):
+                c = ord(ch)
+                nxt = delta.get((s << _SHIFT) | c)
+                if nxt is None:
+                    nxt = delta[(s << _SHIFT) | c] = len(best); best.append(0)
+                    if depth == len(levels): levels.append([])
+                    levels[depth].append((s, c, nxt))
+                s = nxt
+            best[s] = len(term)
+        # 실패 링크는 깊이 순서로 (깊이 1 노드는 root). best[x] = x 에서 끝나는 가장 긴 단어 길이
+        fail = [0] * len(best)
+        for level in levels[1:]:
+            for parent, c, child in level:
+                f = fail[parent]
+                while True:
+                    nxt = delta.get((f << _SHIFT) | c)
+                    if nxt is not None or f == 0: break
+                    f = fail[f]
+                fail[child] = nxt or 0
+                if not best[child]: best[child] = best[fail[child]]
+        self._delta, self._fail, self._best = delta, fail, best
+
+    def find(self, text):
+        """text 안의 단어 등장 범위 [(시작, 끝), ...] (끝 위치 오름차순, 겹칠 수 있음)"""
+        delta, fail, best = self._delta, self._fail, self._best
+        s = 0; spans = []
+        for i, ch in enumerate(text):
+            c = ord(ch)
+            nxt = delta.get((s << _SHIFT) | c)
+            while nxt is None and s:
+                s = fail[s]; nxt = delta.get((s << _SHIFT) | c)
+            s = nxt or 0
+            if best[s]: spans.append((i + 1 - best[s], i + 1))
+        return spans
+
+
+_CACHE = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def read_keywords(lines):
+    """텍스트 라인들 → 단어 목록 (앞뒤 공백 제거, 빈 줄과 # 주석 제외)"""
+    return [t for t in (line.strip() for line in lines) if t and not t.startswith("#")]
+
+
+def keyword_matcher(keywords) -> KeywordMatcher:
+    """
+    keywords: 단어 iterable, 또는 UTF-8 텍스트 파일 경로 (한 줄에 하나, read_keywords 규칙).
+    같은 단어 집합(파일은 경로 + 수정 시각)이면 캐시된 오토마톤을 돌려준다
+    """
+    if keywords is None:
+        raise ValueError("target_mode=keywords needs a keywords list")
+    if isinstance(keywords, KeywordMatcher):
+        return keywords
+    if isinstance(keywords, (str, os.PathLike)):
+        path = os.path.abspath(keywords)
+        st = os.stat(path)
+        key = ("file", path, st.st_mtime_ns, st.st_size)
+    else:
+        keywords = frozenset(keywords)
+        key = keywords
+    with _LOCK:
+        matcher = _CACHE.get(key)
+        if matcher is not None:
+            _CACHE.move_to_end(key)
+            return matcher
+    if isinstance(key, tuple):
+        with open(path, encoding="utf-8-sig") as f: keywords = read_keywords(f)
+    matcher = KeywordMatcher(keywords)
+    if not matcher.size:
+        raise ValueError("keywords list is empty")
+    with _LOCK:
+        _CACHE[key] = matcher
+        while len(_CACHE) > _CACHE_SIZE: _CACHE.popitem(last=False)
+    return matcher
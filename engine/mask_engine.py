@@ -1,11 +1,54 @@
 # engine/mask_engine.py
-import io, os, time, random
+import io, os, re, time, random, hashlib, tempfile, threading, itertools, collections, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import fitz  # PyMuPDF
 from kiwipiepy import Kiwi
 
+from engine.concurrency import budget
+from engine.keywords import keyword_matcher
+from engine.span_cache import SPAN_CACHE
+from engine.stats import NULL_STATS, MaskStats
+from engine.tokenizer_service import TokenizerClient
+
+# rawdict 기본 플래그에서 이미지 보존만 뺀 것. 이미지 블록은 어차피 버리므로 디코딩/복사할 필요가 없다
+TEXT_FLAGS = fitz.TEXTFLAGS_RAWDICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+# 결과 저장 옵션 묶음. balanced 가 기존 동작 (garbage=4, deflate, clean)
+SAVE_PROFILES = {
+    "fast":     {"garbage": 1, "deflate": False, "clean": False},
+    "balanced": {"garbage": 4, "deflate": True, "clean": True},
+    "smallest": {"garbage": 4, "deflate": True, "clean": True, "use_objstms": 1},
+}
+# 구간(chunk) PDF 를 bytes 로 만들 때의 옵션. garbage=4 는 구간 안의 중복을 합친다: interleaved 는 같은 범위를 두 번
+# insert_pdf 하므로 마스킹본과 원본이 폰트/이미지를 따로 갖는다 (fast 는 최종 저장이 garbage=1 이라 안 합치면 test_1 이
+# 4.7MB → 7.9MB, balanced 는 최종 저장이 할 일이 줄어 빨라진다). 구간 사이의 중복은 최종 저장의 garbage=4 만 합친다.
+# fast 만 압축을 가장 가볍게 (zlib 레벨 1 상당, 압축을 빼면 31MB). 측정: bench/bench_save.py
+_CHUNK_DEFAULT = {"garbage": 4, "deflate": True}
+CHUNK_PROFILES = {"fast": dict(_CHUNK_DEFAULT, compression_effort=20)}
+
+# redact 모드 apply_redactions 인자 묶음. 우리는 텍스트만 가리므로 이미지/선 그림 처리는 고를 수 있게 한다
+#   full: MuPDF 기본값 (rect 아래 이미지 픽셀을 지우고, 완전히 덮인 선 그림 제거) / text_only: 이미지, 선 그림은 그대로
+#   cover: 텍스트도 남기고 흰 상자만 덮는다 (가장 빠르지만 가려진 글자를 복사/추출할 수 있음)
+REDACT_PROFILES = {
+    "full":      {"images": fitz.PDF_REDACT_IMAGE_PIXELS, "graphics": fitz.PDF_REDACT_LINE_ART_REMOVE_IF_COVERED,
+                  "text": fitz.PDF_REDACT_TEXT_REMOVE},
+    "text_only": {"images": fitz.PDF_REDACT_IMAGE_NONE, "graphics": fitz.PDF_REDACT_LINE_ART_NONE,
+                  "text": fitz.PDF_REDACT_TEXT_REMOVE},
+    "cover":     {"images": fitz.PDF_REDACT_IMAGE_NONE, "graphics": fitz.PDF_REDACT_LINE_ART_NONE,
+                  "text": fitz.PDF_REDACT_TEXT_NONE},
+}
+
+# 결과 페이지 배치. interleaved: (마스킹본, 원본) 쌍 / masked_only: 마스킹본만 / answer_key: 마스킹본 전체 뒤에 원본 전체
+# layered: 페이지당 한 장. highlight 는 테두리를 "Mask" 레이어(OCG)에, redact 는 원본을 꺼진 "Original" 레이어에 둔다
+LAYOUTS = ("interleaved", "masked_only", "answer_key", "layered")
+# 레이어 이름 → 기본 표시 여부
+LAYERS = {"Mask": True, "Original": False}
+
 DEFAULTS = {
     "mode": "redact",            # "redact" | "highlight"
-    "target_mode": "both",       # "josa_only" | "nouns_only" | "both"
+    "target_mode": "both",       # "josa_only" | "nouns_only" | "both" | "keywords" (keywords 목록만, Kiwi 안 씀)
+    "keywords": None,            # target_mode="keywords" 의 단어 목록 (iterable) 또는 파일 경로 (engine/keywords.py)
     "mask_ratio": 0.95,
     "min_mask_len": 2,
     "allow_noun_span": True,
@@ -13,6 +56,16 @@ DEFAULTS = {
     "stroke_width": 1.8,
     "highlight_color": (1, 0, 0),
     "line_width": 1.8,
+    "batch_pages": 16,           # 한 번에 묶어서 토크나이즈할 페이지 수
+    "span_cache": True,          # 같은 라인 텍스트는 캐시된 span 재사용 (engine/span_cache.py)
+    "text_flags": TEXT_FLAGS,    # 텍스트 추출용 TextPage 플래그 (fitz.TEXT_*)
+    "save_profile": "balanced",  # "fast" | "balanced" | "smallest" (SAVE_PROFILES)
+    "layout": "interleaved",     # LAYOUTS 참고
+    "redact_profile": "full",    # "full" | "text_only" | "cover" (REDACT_PROFILES)
+    "seed": None,                # 고정하면 페이지별 샘플링이 재현 가능 (병렬 결과 == 직렬 결과)
+    "workers": 0,                # 0/1 = 직렬, N>1 = N개 프로세스로 페이지 구간 병렬 처리
+    "chunk_pages": 8,            # 병렬 모드에서 워커 하나가 맡는 페이지 수
+    "stats": None,               # MaskStats 를 주면 단계별 시간/카운터를 기록 (engine/stats.py)
     "nounish_include": {"SL", "SN"},
     "josa_set": {
         "은","는","이","가","을","를","에","에서","에게","께",
@@ -23,40 +76,90 @@ DEFAULTS = {
     }
 }
 
-_KIWI = Kiwi(num_workers=-1)
+# MASK_TOKENIZER_SOCKET 이 있으면 이 프로세스에는 Kiwi 를 올리지 않고 토크나이저 데몬(engine/tokenizer_service.py)에 보낸다
+TOKENIZER_SOCKET = os.getenv("MASK_TOKENIZER_SOCKET", "")
+_TOKENIZER = TokenizerClient(TOKENIZER_SOCKET) if TOKENIZER_SOCKET else None
+# Kiwi 는 처음 쓸 때 올린다 (약 1.3초, 수백 MB). import 만으로는 모델을 읽지 않으므로 /health 는 바로 뜨고,
+# gunicorn --preload 마스터가 Kiwi 스레드 풀을 들고 fork 하지 않는다 (fork 된 자식에서 tokenize 가 멈춘다)
+# 스레드 수는 CPU 예산(engine/concurrency.py)의 워커 몫. 페이지 풀 프로세스는 _init_page_worker 가 따로 정한다
+_KIWI = None
+_KIWI_LOCK = threading.Lock()
+_KIWI_THREADS = None
+_WARM = threading.Event()
+
+def _kiwi():
+    global _KIWI
+    if _KIWI is None:
+        with _KIWI_LOCK:
+            if _KIWI is None: _KIWI = Kiwi(num_workers=_KIWI_THREADS or budget().kiwi_threads)
+    return _KIWI
+
+_FORK_LEFTOVERS = []
+
+def _after_fork():
+    # 부모가 이미 올려 둔 Kiwi / 프로세스 풀 / 데몬 연결은 자식에서 쓸 수 없으므로 처음 쓸 때 다시 만든다.
+    # 부모 Kiwi 는 지우지 않고 붙잡아 둔다 (소멸자가 자식에 없는 스레드 풀을 기다리며 멈춘다)
+    global _KIWI, _KIWI_LOCK, _POOLS, _POOL_LOCK, _TOKENIZER
+    _FORK_LEFTOVERS.extend(x for x in (_KIWI, *_POOLS.values()) if x is not None)
+    _KIWI, _KIWI_LOCK, _POOLS, _POOL_LOCK = None, threading.Lock(), {}, threading.Lock()
+    if _TOKENIZER is not None: _TOKENIZER = TokenizerClient(TOKENIZER_SOCKET)
+    _WARM.clear()
+
+os.register_at_fork(after_in_child=_after_fork)
 
 def _is_nounish_tag(tag: str, include): return tag.startswith("N") or tag in include
 
-def _collect_line_chars(line):
-    out = []
-    for span in line.get("spans", []):
-        chars = span.get("chars") or []
-        for ch in chars:
-            out.append({"char": ch["c"], "bbox": ch["bbox"]})
-    return out
+# 페이지 텍스트의 컬럼형 표현: 라인 문자열 목록 + 페이지 전체 글자 bbox (n, 4) float32 배열.
+# starts[i] 는 texts[i] 첫 글자의 bboxes 행 번호. (MuPDF 좌표는 float 이므로 float32 로 손실 없이 담긴다)
+_PageText = collections.namedtuple("_PageText", "texts starts bboxes")
+
+def _rects_from_ranges(bboxes, ranges):
+    """
+    글자 범위 [s, e) 목록 → 각 범위를 감싸는 rect (m, 4) 배열과 유효 여부.
+    범위들이 오름차순이면 reduceat 한 번으로 모든 범위의 min/max 를 구한다.
+    """
+    out = np.zeros((len(ranges), 4), dtype=np.float32)
+    rng = np.asarray(ranges, dtype=np.intp).reshape(-1, 2)
+    nonempty = rng[:, 1] > rng[:, 0]
+    if nonempty.any():
+        idx = rng[nonempty].ravel()
+        # reduceat 은 [idx[i], idx[i+1]) 구간을 줄인다. 마지막 끝(e == n)은 빼도 "끝까지"로 처리된다
+        if idx[-1] >= len(bboxes): idx = idx[:-1]
+        lo = np.minimum.reduceat(bboxes[:, :2], idx)[::2]
+        hi = np.maximum.reduceat(bboxes[:, 2:], idx)[::2]
+        out[nonempty] = np.hstack([lo, hi])
+    valid = nonempty & (out[:, 2] > out[:, 0]) & (out[:, 3] > out[:, 1])
+    return out, valid
+
+def _merge_boxes(boxes, x_gap=0.5, y_gap=0.12):
+    """
+    같은 줄에서 붙어 있는 rect 를 합친다. boxes 는 (n, 4) 배열 [x0, y0, x1, y1].
+    반환: 병합된 (m, 4) float64 배열, 그리고 병합 rect 별 입력 인덱스 목록.
 
-def _rect_from_char_range(line_chars, s, e):
-    x0=y0=1e9; x1=y1=-1e9
-    for idx in range(s, e):
-        if 0 <= idx < len(line_chars):
-            bx0, by0, bx1, by1 = line_chars[idx]["bbox"]
-            x0 = min(x0, bx0); y0 = min(y0, by0)
-            x1 = max(x1, bx1); y1 = max(y1, by1)
-    return fitz.Rect(x0, y0, x1, y1) if x1 > x0 and y1 > y0 else None
-
-def _merge_rects(rects, x_gap=0.5, y_gap=0.12):
-    if not rects: return []
-    rects = sorted(rects, key=lambda r: (round((r.y0+r.y1)/2, 2), r.x0))
-    merged, cur = [], rects[0]
-    for r in rects[1:]:
-        same_line = abs((r.y0+r.y1)/2 - (cur.y0+cur.y1)/2) <= y_gap * max(1.0, (cur.height + r.height)/2)
-        close_h   = r.x0 <= cur.x1 + x_gap
+    정렬 키(중심 y 를 소수 둘째 자리로 반올림, x0)는 numpy 로 한 번에 계산하고,
+    병합은 현재 rect 가 자라면서 다음 판정이 바뀌는 순차 과정이라 float 리스트 위에서 돈다.
+    fitz.Rect 는 만들지 않는다.
+    """
+    b = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if not len(b): return np.empty((0, 4)), []
+    cy = (b[:, 1] + b[:, 3]) / 2
+    order = np.lexsort((b[:, 0], np.round(cy, 2))).tolist()  # stable: 키가 같으면 입력 순서
+    rows = b.tolist()
+
+    merged, members = [], []
+    cx0, cy0, cx1, cy1 = rows[order[0]]; cur_members = [order[0]]
+    for i in order[1:]:
+        x0, y0, x1, y1 = rows[i]
+        same_line = abs((y0 + y1)/2 - (cy0 + cy1)/2) <= y_gap * max(1.0, ((cy1 - cy0) + (y1 - y0))/2)
+        close_h   = x0 <= cx1 + x_gap
         if same_line and close_h:
-            cur = fitz.Rect(min(cur.x0, r.x0), min(cur.y0, r.y0), max(cur.x1, r.x1), max(cur.y1, r.y1))
+            cx0 = min(cx0, x0); cy0 = min(cy0, y0); cx1 = max(cx1, x1); cy1 = max(cy1, y1)
+            cur_members.append(i)
         else:
-            merged.append(cur); cur = r
-    merged.append(cur)
-    return merged
+            merged.append((cx0, cy0, cx1, cy1)); members.append(cur_members)
+            cx0, cy0, cx1, cy1 = x0, y0, x1, y1; cur_members = [i]
+    merged.append((cx0, cy0, cx1, cy1)); members.append(cur_members)
+    return np.array(merged), members
 
 def _dedup_spans(spans):
     if not spans: return []
@@ -98,64 +201,548 @@ def _spans_all_noun_runs(tokens, min_len, include):
             i += 1
     return spans
 
-def mask_pdf_bytes(pdf_bytes: bytes, **opts) -> bytes:
-    cfg = DEFAULTS.copy(); cfg.update(opts or {})
-    mode = cfg["mode"]; target_mode = cfg["target_mode"]
-    mask_ratio = float(cfg["mask_ratio"]); min_len = int(cfg["min_mask_len"])
+def _extract_lines(page, flags=TEXT_FLAGS):
+    tp = page.get_textpage(flags=flags)
+    return _lines_from_rawdict(page.get_text("rawdict", textpage=tp))
+
+def _lines_from_rawdict(raw):
+    texts, starts, boxes = [], [], []
+    for block in raw.get("blocks", []):
+        if block.get("type") != 0: continue
+        for line in block.get("lines", []):
+            chars = [ch for span in line.get("spans", []) for ch in (span.get("chars") or [])]
+            if not chars: continue
+            line_text = "".join(ch["c"] for ch in chars)
+            if not line_text.strip(): continue
+            texts.append(line_text); starts.append(len(boxes))
+            boxes.extend(ch["bbox"] for ch in chars)
+    return _PageText(texts, starts, np.array(boxes, dtype=np.float32).reshape(-1, 4))
+
+def _tokenize_lines(texts):
+    # iterable 한 번으로 넘겨야 Kiwi 워커 스레드가 라인들을 나눠 처리한다
+    if not texts: return []
+    if _TOKENIZER is not None: return _TOKENIZER.tokenize(texts)
+    return list(_kiwi().tokenize(texts))
+
+def _line_spans(tokens, target_mode, josa_set, allow_span, min_len, include):
+    spans = []
+    if target_mode in ("both", "josa_only"):
+        spans += _spans_before_josa(tokens, josa_set, allow_span, min_len, include)
+    if target_mode in ("both", "nouns_only"):
+        spans += _spans_all_noun_runs(tokens, min_len, include)
+    return tuple(_dedup_spans(spans))
+
+def _spans_for_texts(texts, opts_key, use_cache=True, stats=NULL_STATS):
+    """라인 텍스트 목록 → 라인별 span 목록. 캐시에 없는 (중복 제거된) 라인만 한 번에 tokenize"""
+    result = [None] * len(texts); todo = {}
+    for i, text in enumerate(texts):
+        spans = SPAN_CACHE.get((opts_key, text)) if use_cache else None
+        if spans is None: todo.setdefault(text, []).append(i)
+        else: result[i] = spans
+    target_mode, allow_span, min_len, include, josa_set = opts_key
+    with stats.stage("tokenize"):
+        token_lists = _tokenize_lines(list(todo))
+    with stats.stage("spans"):
+        for text, tokens in zip(todo, token_lists):
+            spans = _line_spans(tokens, target_mode, josa_set, allow_span, min_len, include)
+            if use_cache: SPAN_CACHE.put((opts_key, text), spans)
+            for i in todo[text]: result[i] = spans
+    if stats:
+        stats.add("lines", len(texts)); stats.add("tokens", sum(map(len, token_lists)))
+        stats.add("spans", sum(map(len, result)))
+    return result
+
+def _keyword_spans(texts, matcher, stats=NULL_STATS):
+    """라인 텍스트 목록 → 라인별 keywords 등장 span (Kiwi 를 거치지 않으므로 span 캐시도 쓰지 않는다)"""
+    with stats.stage("spans"):
+        result = [tuple(_dedup_spans(matcher.find(text))) for text in texts]
+    if stats:
+        stats.add("lines", len(texts)); stats.add("spans", sum(map(len, result)))
+    return result
+
+def span_cache_stats():
+    """라인 span 캐시의 hit/miss/eviction 카운터와 현재 크기"""
+    return SPAN_CACHE.stats()
+
+def configure_span_cache(max_entries=None, max_bytes=None):
+    SPAN_CACHE.configure(max_entries=max_entries, max_bytes=max_bytes)
+
+def _page_rng(seed, pno):
+    # 페이지마다 독립된 난수열 → 어느 프로세스가 처리해도 같은 샘플
+    return random if seed is None else random.Random(f"{seed}:{pno}")
+
+def _analyze_pages(src, start, end, cfg):
+    """
+    src[start:end] 각 페이지의 마스킹 후보를 계산해 (pno, rects, sources) 를 내놓는다.
+    rects 는 병합된 후보 rect, sources[i] 는 rects[i] 를 이루는 (라인 번호, 시작, 끝, 텍스트) 목록
+    """
+    target_mode = cfg["target_mode"]; min_len = int(cfg["min_mask_len"])
     allow_span = bool(cfg["allow_noun_span"])
+    include = frozenset(cfg["nounish_include"]); josa_set = frozenset(cfg["josa_set"])
+    batch_pages = max(1, int(cfg["batch_pages"])); text_flags = int(cfg["text_flags"])
+    opts_key = (target_mode, allow_span, min_len, include, josa_set)
+    use_cache = bool(cfg["span_cache"]); stats = cfg["stats"] or NULL_STATS
+    matcher = keyword_matcher(cfg["keywords"]) if target_mode == "keywords" else None
+
+    for b_start in range(start, end, batch_pages):
+        pnos = range(b_start, min(b_start + batch_pages, end))
+        with stats.stage("get_text"):
+            page_texts = [_extract_lines(src.load_page(pno), text_flags) for pno in pnos]
+        texts = [text for pt in page_texts for text in pt.texts]
+        line_spans = iter(_keyword_spans(texts, matcher, stats) if matcher
+                          else _spans_for_texts(texts, opts_key, use_cache, stats))
+        stats.add("pages", len(pnos))
+
+        for pno, pt in zip(pnos, page_texts):
+            with stats.stage("merge"):
+                ranges, sources = [], []
+                for li, (line_text, off) in enumerate(zip(pt.texts, pt.starts)):
+                    for s, e in next(line_spans):
+                        ranges.append((off + s, off + e)); sources.append((li, s, e, line_text[s:e]))
+                boxes, valid = _rects_from_ranges(pt.bboxes, ranges)
+                sources = list(itertools.compress(sources, valid.tolist()))
+                merged, members = _merge_boxes(boxes[valid])
+                rects = [fitz.Rect(r) for r in merged.tolist()]
+            stats.add("rects", len(rects))
+            yield pno, rects, [[sources[i] for i in m] for m in members]
+
+def _mark_page(page, pno, rects, cfg, src=None, layers=None):
+    """후보 rects 중 mask_ratio 만큼 골라 page 에 마스킹을 그린다. layers 가 있으면 레이어(OCG)로 나눠 그린다"""
+    mode = cfg["mode"]; mask_ratio = float(cfg["mask_ratio"])
     stroke_color = tuple(cfg["stroke_color"]); stroke_w = float(cfg["stroke_width"])
     hi_color = tuple(cfg["highlight_color"]); line_w = float(cfg["line_width"])
-    include = set(cfg["nounish_include"]); josa_set = set(cfg["josa_set"])
 
-    src = fitz.open(stream=pdf_bytes, filetype="pdf")
-    out = fitz.open()
+    if rects:
+        k = int(len(rects) * max(0.0, min(1.0, mask_ratio)))
+        k = max(0, min(k, len(rects)))
+        if 0 < k < len(rects): rects = _page_rng(cfg["seed"], pno).sample(rects, k)
+
+    if mode == "redact":
+        # 주석 모양(set_colors/update)은 apply_redactions 가 주석을 지우면서 버려지므로 만들지 않는다
+        for r in rects: page.add_redact_annot(r, fill=(1, 1, 1))
+        if rects: page.apply_redactions(**REDACT_PROFILES[cfg["redact_profile"]])
+        _draw_rects(page, rects, stroke_color, stroke_w)
+        # 지우기 전 원본 페이지를 꺼진 레이어로 위에 얹는다 (켜면 원본이 보임)
+        if layers and rects: page.show_pdf_page(page.rect, src, pno, overlay=True, oc=layers["Original"])
+    else:  # highlight
+        _draw_rects(page, rects, hi_color, line_w, layers["Mask"] if layers else 0)
 
-    for pno in range(len(src)):
-        page = src.load_page(pno)
-        out.insert_pdf(src, from_page=pno, to_page=pno)
-        marked = out[-1]
-
-        raw = page.get_text("rawdict"); rects = []
-        for block in raw.get("blocks", []):
-            if block.get("type") != 0: continue
-            for line in block.get("lines", []):
-                line_chars = _collect_line_chars(line)
-                if not line_chars: continue
-                line_text = "".join(ch["char"] for ch in line_chars)
-                if not line_text.strip(): continue
-
-                tokens = _KIWI.tokenize(line_text)
-                spans = []
-                if target_mode in ("both", "josa_only"):
-                    spans += _spans_before_josa(tokens, josa_set, allow_span, min_len, include)
-                if target_mode in ("both", "nouns_only"):
-                    spans += _spans_all_noun_runs(tokens, min_len, include)
-                spans = _dedup_spans(spans)
-
-                for s, e in spans:
-                    r = _rect_from_char_range(line_chars, s, e)
-                    if r: rects.append(r)
-
-        rects = _merge_rects(rects)
-        if rects:
-            k = int(len(rects) * max(0.0, min(1.0, mask_ratio)))
-            k = max(0, min(k, len(rects)))
-            if 0 < k < len(rects): rects = random.sample(rects, k)
-
-        if mode == "redact":
-            for r in rects:
-                annot = marked.add_redact_annot(r, fill=(1, 1, 1))
-                try: annot.set_colors(stroke=stroke_color); annot.update()
-                except Exception: pass
-            marked.apply_redactions()
-            for r in rects: marked.draw_rect(r, color=stroke_color, width=stroke_w, fill=None, overlay=True)
-        else:  # highlight
-            for r in rects: marked.draw_rect(r, color=hi_color, width=line_w, fill=None, overlay=True)
-
-        out.insert_pdf(src, from_page=pno, to_page=pno)
-
-    src.close()
-    out_io = io.BytesIO()
-    out.save(out_io, garbage=4, deflate=True, clean=True)
+def _draw_rects(page, rects, color, width, oc=0):
+    """rects 테두리를 shape 하나에 모아 한 번에 commit (draw_rect 를 rect 마다 부르면 q/Q 조각이 rect 수만큼 쌓인다)"""
+    if not rects: return
+    shape = page.new_shape()
+    for r in rects: shape.draw_rect(r)
+    shape.finish(color=color, width=width, fill=None, oc=oc)
+    shape.commit(overlay=True)
+
+def _render_range(src, out, start, end, page_rects, cfg):
+    """
+    src[start:end] 를 빈 문서 out 에 한 번에 복사하고 (pno, rects) 마다 마스킹한다.
+    interleaved 면 원본 구간도 한 번에 붙인 뒤 select 로 (마스킹본, 원본) 순서로 재배치.
+    answer_key 의 원본은 문서 끝에 한 번에 붙이므로 여기서는 masked_only 와 같다.
+    """
+    out.insert_pdf(src, from_page=start, to_page=end - 1)
+    layers = None
+    if cfg["layout"] == "layered":
+        name = "Original" if cfg["mode"] == "redact" else "Mask"
+        layers = {name: out.add_ocg(name, on=LAYERS[name])}
+    stats = cfg["stats"] or NULL_STATS
+    for pno, rects in page_rects:
+        with stats.stage("redact"): _mark_page(out[pno - start], pno, rects, cfg, src, layers)
+    if cfg["layout"] == "interleaved":
+        out.insert_pdf(src, from_page=start, to_page=end - 1)
+        n = end - start
+        out.select([i for k in range(n) for i in (k, n + k)])
+
+def _register_layers(doc, first_page=0):
+    """
+    insert_pdf 는 /OCProperties 를 옮기지 않아 구간 문서에서 만든 레이어가 등록되지 않은 채 복사된다.
+    doc[first_page:] 페이지가 참조하는 OCG 를 doc 에 등록된 같은 이름의 레이어로 바꿔 단다 (없으면 새로 등록).
+    """
+    layers = {v["name"]: x for x, v in doc.get_ocgs().items()}
+    canon = {}
+
+    def target(xref):
+        if xref not in canon:
+            canon[xref] = xref
+            if doc.xref_get_key(xref, "Type") == ("name", "/OCG"):
+                name = doc.xref_get_key(xref, "Name")[1]
+                if name not in layers: layers[name] = doc.add_ocg(name, on=LAYERS.get(name, True))
+                canon[xref] = layers[name]
+        return canon[xref]
+
+    for pno in range(first_page, len(doc)):
+        px = doc.page_xref(pno)
+        # draw_rect(oc=) → /Resources/Properties 의 마크 콘텐츠. 소스를 정규식으로 고치면 중첩 dict (인라인 OCMD 등) 가
+        # 잘리므로 Properties 를 간접 객체로 꺼내 항목마다 xref_get_key / xref_set_key 로 바꾼다
+        kind, res = doc.xref_get_key(px, "Resources")
+        holder, key = (int(res.split()[0]), "Properties") if kind == "xref" else (px, "Resources/Properties")
+        kind, props = doc.xref_get_key(holder, key)
+        if kind == "dict":
+            source, props = props, doc.get_new_xref()
+            doc.update_object(props, source); doc.xref_set_key(holder, key, f"{props} 0 R")
+        elif kind == "xref": props = int(props.split()[0])
+        else: props = None
+        for name in doc.xref_get_keys(props) if props else ():
+            kind, value = doc.xref_get_key(props, name)
+            if kind == "xref":
+                doc.xref_set_key(props, name, f"{target(int(value.split()[0]))} 0 R")
+            elif kind == "dict":  # 인라인 OCMD: /OCGs 의 참조만
+                kind, ocgs = doc.xref_get_key(props, f"{name}/OCGs")
+                if kind in ("xref", "array"):
+                    doc.xref_set_key(props, f"{name}/OCGs", re.sub(
+                        r"(\d+) 0 R", lambda r: f"{target(int(r.group(1)))} 0 R", ocgs))
+        kind, xobjs = doc.xref_get_key(px, "Resources/XObject")  # show_pdf_page(oc=) → Form XObject 의 /OC
+        if kind == "dict":
+            for xref in re.findall(r"/fzFrm\d+ (\d+) 0 R", xobjs):
+                kind, oc = doc.xref_get_key(int(xref), "OC")
+                if kind == "xref": doc.xref_set_key(int(xref), "OC", f"{target(int(oc.split()[0]))} 0 R")
+
+def _mask_pages(src, out, start, end, cfg):
+    _render_range(src, out, start, end, ((pno, rects) for pno, rects, _ in _analyze_pages(src, start, end, cfg)), cfg)
+
+# ---- 병렬 모드: 워커 프로세스마다 Kiwi 를 한 번만 올려두고 재사용 ----
+# 프로세스 수마다 풀 하나 (/mask 의 page_workers 와 /mask/batch 의 MASK_BATCH_WORKERS 가 다를 수 있다).
+# 크기가 다른 요청이 남의 풀을 닫아 버리면 그 풀을 쓰던 요청이 "cannot schedule new futures after shutdown" 으로 실패한다
+_POOLS = {}
+_POOL_LOCK = threading.Lock()
+
+def _init_page_worker(kiwi_threads):
+    global _KIWI_THREADS
+    _KIWI_THREADS = kiwi_threads
+
+def _get_pool(workers):
+    with _POOL_LOCK:  # 스레드 서버에서 동시에 들어온 요청이 풀을 두 개 만들지 않도록
+        pool = _POOLS.get(workers)
+        # 자식 하나가 죽으면 (OOM kill, MuPDF segfault) 풀 전체가 broken 이 되어 이후 submit 이 모두 실패하므로 새로 만든다
+        if pool is None or pool._broken:
+            if pool is not None: pool.shutdown(wait=False, cancel_futures=True)
+            # fork 는 Kiwi 스레드 풀을 망가뜨리므로 spawn (자식은 첫 구간에서 Kiwi 를 새로 로드)
+            pool = _POOLS[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_page_worker, initargs=(budget().page_kiwi_threads,))
+        return pool
+
+def _chunk_bytes(out, cfg):
+    data = out.tobytes(**CHUNK_PROFILES.get(cfg["save_profile"], _CHUNK_DEFAULT))
     out.close()
-    return out_io.getvalue()
+    return data
+
+def _mask_chunk(src, start, end, cfg):
+    """src[start:end] 구간을 마스킹해 독립된 PDF 바이트로 반환 (직렬/병렬 공통 단위)"""
+    out = fitz.open()
+    _mask_pages(src, out, start, end, cfg)
+    with (cfg["stats"] or NULL_STATS).stage("save"): return _chunk_bytes(out, cfg)
+
+def _analyze_chunk(src, start, end, cfg):
+    """src[start:end] 구간의 마스크 플랜 페이지 항목 목록 (JSON 직렬화 가능)"""
+    return [
+        {"page": pno,
+         "candidates": [{"rect": [r.x0, r.y0, r.x1, r.y1], "spans": [list(x) for x in srcs]}
+                        for r, srcs in zip(rects, sources)]}
+        for pno, rects, sources in _analyze_pages(src, start, end, cfg)
+    ]
+
+def _render_chunk(src, start, end, cfg, page_rects):
+    out = fitz.open()
+    _render_range(src, out, start, end, ((pno, page_rects.get(pno, [])) for pno in range(start, end)), cfg)
+    with (cfg["stats"] or NULL_STATS).stage("save"): return _chunk_bytes(out, cfg)
+
+def _copy_chunk(src, start, end, cfg):
+    out = fitz.open()
+    out.insert_pdf(src, from_page=start, to_page=end - 1)
+    return _chunk_bytes(out, cfg)
+
+def _run_chunk_file(fn, path, start, end, cfg):
+    src = fitz.open(path)
+    try:
+        if cfg["stats"] is None: return fn(src, start, end, cfg)
+        # 워커에서 잰 값은 (결과, stats dict) 로 돌려보내 부모의 stats 에 합친다
+        stats = MaskStats()
+        return fn(src, start, end, dict(cfg, stats=stats)), stats.as_dict()
+    finally: src.close()
+
+def _open_src(pdf):
+    # bytes 는 메모리에서, 경로(str/PathLike)는 파일에서 연다
+    if isinstance(pdf, (bytes, bytearray, memoryview)): return fitz.open(stream=pdf, filetype="pdf")
+    return fitz.open(pdf)
+
+def page_count(pdf) -> int:
+    """페이지 수만 (페이지 트리만 읽으므로 수 ms). 로그/메트릭용"""
+    with _open_src(pdf) as src: return len(src)
+
+def _iter_chunks(src, pdf, cfg, fn=_mask_chunk, progress=None):
+    """
+    페이지 구간별 fn(src, start, end, cfg) 결과를 순서대로 내놓는다. workers>1 이면 프로세스 풀에서 계산.
+    progress(끝난 페이지 수, 전체 페이지 수) 는 구간이 끝날 때마다 호출된다.
+    """
+    workers = int(cfg["workers"]); chunk = max(1, int(cfg["chunk_pages"]))
+    ranges = [(s, min(s + chunk, len(src))) for s in range(0, len(src), chunk)]
+    if progress is None: progress = lambda done, total: None
+    if workers <= 1 or len(ranges) <= 1:
+        for s, e in ranges:
+            data = fn(src, s, e, cfg)
+            progress(e, len(src))
+            yield data
+        return
+    spooled = isinstance(pdf, (bytes, bytearray, memoryview))
+    if spooled:  # 워커는 경로로 연다 → 입력을 한 번만 디스크에 쓴다
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f: f.write(pdf)
+    else:
+        path = os.fspath(pdf)
+    try:
+        pool = _get_pool(workers)
+        pending = collections.deque()
+
+        def _next():
+            end, fut = pending.popleft()
+            data = fut.result()
+            if cfg["stats"] is not None:
+                data, part = data; cfg["stats"].merge(part)
+            progress(end, len(src))
+            return data
+
+        for s, e in ranges:
+            pending.append((e, pool.submit(_run_chunk_file, fn, path, s, e, cfg)))
+            # 완료됐지만 아직 소비되지 않은 구간이 쌓이지 않도록 in-flight 수 제한
+            if len(pending) >= 2 * workers: yield _next()
+        while pending: yield _next()  # 제출 순서대로 → 페이지 순서 유지
+    finally:
+        if spooled: os.remove(path)
+
+def _save_kwargs(cfg):
+    # 잘못된 출력 옵션은 마스킹 작업 전에 거른다
+    if cfg["layout"] not in LAYOUTS:
+        raise ValueError(f"layout must be one of {'|'.join(LAYOUTS)}")
+    if cfg["redact_profile"] not in REDACT_PROFILES:
+        raise ValueError(f"redact_profile must be one of {'|'.join(REDACT_PROFILES)}")
+    name = cfg["save_profile"]
+    if name not in SAVE_PROFILES:
+        raise ValueError(f"save_profile must be one of {'|'.join(SAVE_PROFILES)}")
+    return SAVE_PROFILES[name]
+
+def _build(parts, originals=None, layered=False):
+    # 직렬/병렬/플랜 렌더 모두 같은 구간 단위로 조립해야 결과가 바이트 단위로 같다
+    out = fitz.open()
+    for data in parts:
+        part = fitz.open(stream=data, filetype="pdf")
+        out.insert_pdf(part)
+        part.close()
+    if originals is not None: out.insert_pdf(originals)  # answer_key: 원본 전체를 한 번에
+    if layered: _register_layers(out)
+    return out
+
+class _FileSink:
+    """PyMuPDF 는 name 속성이 있는 파일 객체를 그 이름(경로)으로 다시 열어 쓰므로, 파일 객체는 이름 없이 감싸서 넘긴다"""
+    def __init__(self, f):
+        self.write, self.seek, self.tell, self.truncate = f.write, f.seek, f.tell, f.truncate
+
+def _assemble(parts, cfg, src, dst=None):
+    """조립한 결과를 dst(경로 또는 쓰기 가능한 파일 객체)에 바로 저장. dst 가 없으면 bytes 로 반환"""
+    save_kwargs = _save_kwargs(cfg)
+    out = _build(parts, src if cfg["layout"] == "answer_key" else None, cfg["layout"] == "layered")
+    try:
+        with (cfg["stats"] or NULL_STATS).stage("save"):
+            if dst is not None:
+                out.save(_FileSink(dst) if hasattr(dst, "write") else os.fspath(dst), **save_kwargs)
+                return None
+            out_io = io.BytesIO()
+            out.save(out_io, **save_kwargs)
+            return out_io.getvalue()
+    finally:
+        out.close()
+
+def mask_pdf_bytes(pdf_bytes: bytes, progress=None, **opts) -> bytes:
+    """progress(끝난 페이지 수, 전체 페이지 수) 를 주면 구간이 끝날 때마다 호출"""
+    cfg = DEFAULTS.copy(); cfg.update(opts or {})
+    src = _open_src(pdf_bytes)
+    try: return _assemble(_iter_chunks(src, pdf_bytes, cfg, progress=progress), cfg, src)
+    finally: src.close()
+
+def mask_pdf_file(pdf, dst, progress=None, **opts) -> int:
+    """
+    파일 경로 → 파일 경로(또는 파일 객체) 마스킹. 입력은 경로로 열어 MuPDF 가 필요한 만큼만 읽고,
+    결과는 dst 에 바로 저장하므로 입력/출력 전체를 bytes 로 들고 있지 않는다. 결과는 mask_pdf_bytes 와 같다.
+    입력 페이지 수를 반환 (로그/메트릭용)
+    """
+    cfg = DEFAULTS.copy(); cfg.update(opts or {})
+    src = _open_src(pdf)
+    try:
+        _assemble(_iter_chunks(src, pdf, cfg, progress=progress), cfg, src, dst)
+        return len(src)
+    finally:
+        src.close()
+
+# ---- 여러 파일 한 번에 (파일 단위 병렬) ----
+def _mask_file_entry(src, dst, opts):
+    # 워커 프로세스에서 실행. MuPDF 예외는 pickle 이 안 될 수 있으므로 메시지로 돌려준다
+    try: mask_pdf_file(src, dst, **opts)
+    except Exception as e: return f"{type(e).__name__}: {e}"
+    return None
+
+def iter_mask_files(items, workers=0, **opts):
+    """
+    items: (입력 경로, 출력 경로, 파일별 옵션 dict) 의 iterable. 입력 순서대로 (입력, 출력, 오류 메시지 또는 None) 을 내놓는다.
+    workers>1 이면 파일 단위로 프로세스 풀에서 병렬 처리하고, 처리 중인 파일은 2*workers 개까지만 꺼내 온다
+    (items 가 generator 면 입력 준비도 그만큼만 앞서 간다). 한 파일이 실패해도 나머지는 계속 처리한다.
+    """
+    base = dict(opts, workers=0)  # 파일 안에서는 직렬 (이미 파일 단위로 병렬)
+    workers = int(workers)
+    if workers <= 1:
+        for src, dst, item_opts in items:
+            yield src, dst, _mask_file_entry(src, dst, dict(base, **item_opts))
+        return
+    pending = collections.deque()
+    for src, dst, item_opts in items:
+        # 풀이 깨졌으면 _get_pool 이 새로 만든다 (죽은 풀에 걸려 있던 파일만 실패로 남는다)
+        pending.append((src, dst, _get_pool(workers).submit(_mask_file_entry, src, dst, dict(base, **item_opts))))
+        if len(pending) >= 2 * workers:
+            src_, dst_, fut = pending.popleft()
+            yield src_, dst_, _entry_result(fut)
+    while pending:
+        src_, dst_, fut = pending.popleft()
+        yield src_, dst_, _entry_result(fut)
+
+def _entry_result(fut):
+    # 풀 프로세스가 죽으면 (OOM kill, MuPDF segfault) BrokenProcessPool. 그 파일의 오류로 돌려주고 다음 파일은 계속
+    try: return fut.result()
+    except Exception as e: return f"{type(e).__name__}: {e}"
+
+# ---- analyze once / render many ----
+# 형태소 분석 결과에만 영향을 주는 옵션. 나머지(mode, mask_ratio, 색, seed ...)는 render 단계 옵션
+ANALYZE_OPTS = ("target_mode", "min_mask_len", "allow_noun_span", "nounish_include", "josa_set")
+
+def _sha256(pdf):
+    h = hashlib.sha256()
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        h.update(pdf)
+    else:
+        with open(pdf, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""): h.update(block)
+    return h.hexdigest()
+
+def analyze_pdf(pdf, **opts) -> dict:
+    """
+    마스크 플랜 생성 (Kiwi 분석까지만). 결과는 JSON 으로 그대로 직렬화할 수 있다.
+      {"version": 1, "sha256": 입력 해시, "page_count": N, "options": {분석 옵션},
+       "pages": [{"page": pno, "candidates": [{"rect": [x0, y0, x1, y1],
+                                               "spans": [[라인 번호, 시작, 끝, 텍스트], ...]}, ...]}, ...]}
+    """
+    cfg = DEFAULTS.copy(); cfg.update(opts or {})
+    src = _open_src(pdf)
+    try:
+        pages = [p for part in _iter_chunks(src, pdf, cfg, _analyze_chunk) for p in part]
+        page_count = len(src)
+    finally:
+        src.close()
+    options = {k: sorted(cfg[k]) if isinstance(cfg[k], (set, frozenset)) else cfg[k] for k in ANALYZE_OPTS}
+    if cfg["target_mode"] == "keywords": options["keywords_sha256"] = keyword_matcher(cfg["keywords"]).digest
+    return {"version": 1, "sha256": _sha256(pdf), "page_count": page_count, "options": options, "pages": pages}
+
+def render_pdf(pdf, plan: dict, dst=None, **opts):
+    """
+    analyze_pdf 플랜을 PDF 에 적용 (mode, mask_ratio, 색, seed 만 바꿔 다시 그릴 때 Kiwi 를 거치지 않음).
+    dst(경로 또는 파일 객체)를 주면 거기에 저장하고 None, 아니면 bytes 반환
+    """
+    cfg = DEFAULTS.copy(); cfg.update(opts or {})
+    if plan.get("version") != 1: raise ValueError("unsupported mask plan version")
+    src = _open_src(pdf)
+    try:
+        if len(src) != plan.get("page_count"): raise ValueError("mask plan does not match this PDF (page count)")
+        page_rects = {p["page"]: [fitz.Rect(c["rect"]) for c in p["candidates"]] for p in plan["pages"]}
+        chunk = max(1, int(cfg["chunk_pages"]))
+        return _assemble((_render_chunk(src, s, min(s + chunk, len(src)), cfg, page_rects)
+                          for s in range(0, len(src), chunk)), cfg, src, dst)
+    finally:
+        src.close()
+
+def iter_mask_pdf(pdf, progress=None, **opts):
+    """
+    스트리밍 모드. chunk_pages 페이지마다 결과 PDF 의 다음 바이트 블록을 내놓는다.
+    블록을 순서대로 이어 붙이면 하나의 완전한 PDF 가 된다. progress 는 mask_pdf_bytes 와 같다.
+
+    결과 문서는 임시 파일에 두고 구간마다 증분 저장(incremental update)으로 덧붙이므로
+    메모리에는 항상 한 구간만 올라온다. 증분 저장은 기존 바이트를 고치지 않고 뒤에만 쓰기 때문에
+    새로 늘어난 꼬리 부분을 그대로 내보내면 된다.
+    (구간마다 폰트 등 공유 리소스가 따로 복사되므로 mask_pdf_bytes 결과보다 파일이 조금 크다)
+    """
+    cfg = DEFAULTS.copy(); cfg.update(opts or {})
+    # 증분 저장에는 object stream 을 쓸 수 없으므로 첫 구간 저장에만 프로필을 적용
+    first_save = {k: v for k, v in _save_kwargs(cfg).items() if k != "use_objstms"}
+    src = _open_src(pdf)
+    fd, path = tempfile.mkstemp(suffix=".pdf"); os.close(fd)
+    try:
+        sent = 0
+        parts = _iter_chunks(src, pdf, cfg, progress=progress)
+        if cfg["layout"] == "answer_key":
+            chunk = max(1, int(cfg["chunk_pages"]))
+            parts = itertools.chain(parts, (_copy_chunk(src, s, min(s + chunk, len(src)), cfg)
+                                            for s in range(0, len(src), chunk)))
+        stats = cfg["stats"] or NULL_STATS
+        for i, data in enumerate(parts):
+            with stats.stage("save"):
+                part = fitz.open(stream=data, filetype="pdf")
+                if i == 0:
+                    part.save(path, **first_save)
+                else:
+                    out = fitz.open(path)
+                    n = len(out)
+                    out.insert_pdf(part)
+                    if cfg["layout"] == "layered": _register_layers(out, n)
+                    out.save(path, incremental=True, deflate=first_save["deflate"], encryption=fitz.PDF_ENCRYPT_KEEP)
+                    out.close()
+                part.close()
+            with open(path, "rb") as f:
+                f.seek(sent); block = f.read()
+            sent += len(block)
+            yield block
+    finally:
+        src.close()
+        os.remove(path)
+
+def mask_pdf_to(pdf, sink, **opts) -> int:
+    """스트리밍 모드 결과를 파일 객체 sink 에 바로 쓴다. 쓴 바이트 수를 반환"""
+    written = 0
+    for block in iter_mask_pdf(pdf, **opts):
+        sink.write(block); written += len(block)
+    return written
+
+# ---- 워밍업: 첫 요청이 Kiwi 로드 / 첫 토큰화 / MuPDF 폰트 로드 비용을 떠안지 않도록 미리 한 번 돌린다 ----
+_WARMUP_TEXTS = (
+    "개인정보 보호법에 따라 성명과 주소는 가려서 제출한다.",
+    "학생은 수업 시간에 배운 개념을 문제에 적용해 본다.",
+    "Kiwi 형태소 분석기로 명사와 조사를 나누어 마스킹 대상을 고른다.",
+    "2024년 3월 회의록: 예산 집행 계획과 일정 조정 안건",
+)
+
+def _warmup_pdf():
+    doc = fitz.open()
+    page = doc.new_page()
+    for i, text in enumerate(_WARMUP_TEXTS):
+        page.insert_text((50, 72 + 20 * i), text, fontname="korea", fontsize=10)
+    try: return doc.tobytes()
+    finally: doc.close()
+
+def _warmup_here():
+    _tokenize_lines(list(_WARMUP_TEXTS) * 4)
+    mask_pdf_bytes(_warmup_pdf(), span_cache=False)
+    return os.getpid()
+
+def warmup(workers=None) -> float:
+    """
+    Kiwi 로드 + 작은 말뭉치 토큰화 + 한 장짜리 PDF 마스킹. 걸린 시간(초). 끝나면 is_warm() == True
+    workers (기본: CPU 예산의 page_workers) 가 2 이상이면 페이지 풀도 띄우고 자식마다 같은 일을 한 번씩 시킨다
+    (안 그러면 첫 여러 구간짜리 /mask 가 자식 spawn + 자식마다 Kiwi 로드를 떠안는다)
+    """
+    t = time.perf_counter()
+    workers = budget().page_workers if workers is None else int(workers)
+    # 자식이 Kiwi 를 올리는 동안 (수 초) 나머지 작업은 다른 자식이 가져가므로 자식마다 하나씩 돌아간다
+    pending = [_get_pool(workers).submit(_warmup_here) for _ in range(workers)] if workers > 1 else []
+    _warmup_here()
+    for fut in pending: fut.result()
+    _WARM.set()
+    return time.perf_counter() - t
+
+def is_warm() -> bool:
+    return _WARM.is_set()
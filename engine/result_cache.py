@@ -0,0 +1,126 @@
+# engine/result_cache.py
+# 문서 단위 결과 캐시: sha256(입력 PDF) + 정규화된 옵션(+ seed) → 마스킹 결과 PDF
+# 디스크에 파일 하나씩 저장하고, 전체 크기 상한과 TTL 로 정리한다.
+# mtime = 만든 시각 (TTL 기준, 적중해도 바꾸지 않는다), atime = 마지막 사용 시각 (LRU 기준, 적중 시 갱신).
+# 항목마다 <키>.json 에 작은 메타데이터 (입력 페이지 수 등) 를 같이 둔다 → 적중 시 fitz 로 입력을 열지 않고 로그/메트릭을 남긴다.
+import hashlib, json, os, shutil, tempfile, threading, time
+from contextlib import contextmanager
+
+# 결과 PDF 내용에 영향을 주지 않는 옵션 (캐시 키에서 제외)
+_IGNORED_OPTS = {"workers", "chunk_pages", "batch_pages", "span_cache", "stats"}
+
+
+def hash_file(f, block=1024 * 1024) -> str:
+    """파일 객체(또는 Django UploadedFile)를 블록 단위로 읽어 sha256 hex. 위치는 처음으로 되돌린다"""
+    h = hashlib.sha256()
+    chunks = f.chunks(block) if hasattr(f, "chunks") else iter(lambda: f.read(block), b"")
+    for chunk in chunks: h.update(chunk)
+    f.seek(0)
+    return h.hexdigest()
+
+
+def _jsonable(v):
+    if isinstance(v, (set, frozenset)): return sorted(v)
+    if isinstance(v, tuple): return list(v)
+    return v
+
+
+def cache_key(input_sha256: str, opts: dict) -> str:
+    from engine.mask_engine import DEFAULTS
+    cfg = DEFAULTS.copy(); cfg.update(opts or {})
+    if cfg.get("keywords") is not None:  # 목록(또는 파일) 내용으로 → 같은 단어 집합이면 같은 키
+        from engine.keywords import keyword_matcher
+        cfg["keywords"] = keyword_matcher(cfg["keywords"]).digest
+    norm = {k: _jsonable(v) for k, v in cfg.items() if k not in _IGNORED_OPTS}
+    blob = json.dumps(norm, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(input_sha256.encode("ascii") + b"\0" + blob).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, directory, max_bytes=1024 * 1024 * 1024, ttl=24 * 3600):
+        self.directory = os.fspath(directory)
+        self.max_bytes = int(max_bytes)
+        self.ttl = float(ttl)
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".pdf")
+
+    def _meta_path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def open(self, key):
+        """캐시 적중 시 결과 파일 객체(rb), 아니면 None. 적중하면 atime 을 갱신해 LRU 순서에 반영 (TTL 은 그대로)"""
+        path = self._path(key)
+        try:
+            st = os.stat(path)
+            if self.ttl > 0 and time.time() - st.st_mtime > self.ttl:
+                self._remove(path)
+                return None
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        os.utime(path, (time.time(), st.st_mtime))
+        return f
+
+    def meta(self, key) -> dict:
+        """writer / put_file 에 넘긴 메타데이터. 없으면 (메타데이터 도입 전 항목 등) 빈 dict"""
+        try:
+            with open(self._meta_path(key), encoding="utf-8") as f: return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def get(self, key):
+        f = self.open(key)
+        if f is None: return None
+        with f: return f.read()
+
+    @contextmanager
+    def writer(self, key, meta=None):
+        """
+        임시 파일에 쓰고 정상 종료 시에만 원자적으로 교체 (중간에 끊긴 결과는 남기지 않는다).
+        meta (dict) 는 with 블록이 끝날 때 기록하므로 쓰는 도중에 채워도 된다. 결과보다 먼저 교체한다
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f: yield f
+            if meta:
+                with open(tmp + ".json", "w", encoding="utf-8") as m: json.dump(meta, m)
+                os.replace(tmp + ".json", self._meta_path(key))
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            for path in (tmp, tmp + ".json"): self._remove(path)
+            raise
+        self.evict()
+
+    def put(self, key, data: bytes, meta=None):
+        with self.writer(key, meta) as f: f.write(data)
+
+    def put_file(self, key, f, meta=None):
+        """파일 객체 f 의 현재 위치부터 끝까지를 블록 단위로 복사 (결과 전체를 메모리에 올리지 않는다)"""
+        with self.writer(key, meta) as w: shutil.copyfileobj(f, w, 1024 * 1024)
+
+    def evict(self):
+        """만든 지 TTL 이 지난 항목을 지우고, 전체 크기가 max_bytes 를 넘으면 오래 안 쓰인 것부터 지운다"""
+        with self._lock:
+            now = time.time(); entries = []
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith(".pdf"): continue
+                try: st = entry.stat()
+                except FileNotFoundError: continue
+                if self.ttl > 0 and now - st.st_mtime > self.ttl:
+                    self._remove(entry.path)
+                else:
+                    entries.append((st.st_atime, st.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes: break
+                self._remove(path); total -= size
+
+    @staticmethod
+    def _remove(path):
+        # 결과 PDF 를 지우면 메타데이터도 같이
+        for p in (path, path[:-4] + ".json") if path.endswith(".pdf") else (path,):
+            try: os.remove(p)
+            except FileNotFoundError: pass
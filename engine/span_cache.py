@@ -0,0 +1,76 @@
+# engine/span_cache.py
+# (라인 텍스트, 옵션) → 마스킹 span 목록 LRU 캐시
+# 머리말/꼬리말/쪽번호/서식 라벨처럼 반복되는 라인은 Kiwi 를 다시 돌리지 않는다.
+import os, sys, threading
+from collections import OrderedDict
+
+
+def _entry_size(key, spans):
+    # 대략적인 메모리 크기 (텍스트 + 튜플 오버헤드 + span 당 (s, e) 튜플)
+    return sys.getsizeof(key[1]) + 120 + 64 * len(spans)
+
+
+class SpanCache:
+    def __init__(self, max_entries=50_000, max_bytes=64 * 1024 * 1024):
+        self.max_entries = int(max_entries)
+        self.max_bytes = int(max_bytes)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, spans):
+        if self.max_entries <= 0 or self.max_bytes <= 0: return
+        size = _entry_size(key, spans)
+        if size > self.max_bytes: return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None: self.bytes -= old[1]
+            self._data[key] = (spans, size)
+            self.bytes += size
+            while len(self._data) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, sz) = self._data.popitem(last=False)
+                self.bytes -= sz
+                self.evictions += 1
+
+    def configure(self, max_entries=None, max_bytes=None):
+        if max_entries is not None: self.max_entries = int(max_entries)
+        if max_bytes is not None: self.max_bytes = int(max_bytes)
+        with self._lock:
+            while self._data and (len(self._data) > self.max_entries or self.bytes > self.max_bytes):
+                _, (_, sz) = self._data.popitem(last=False)
+                self.bytes -= sz
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data), "bytes": self.bytes,
+                "max_entries": self.max_entries, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+
+# 프로세스 전역 캐시. 크기는 환경변수 또는 configure() 로 조정
+SPAN_CACHE = SpanCache(
+    max_entries=os.getenv("MASK_SPAN_CACHE_ENTRIES", 50_000),
+    max_bytes=os.getenv("MASK_SPAN_CACHE_BYTES", 64 * 1024 * 1024),
+)
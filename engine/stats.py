@@ -0,0 +1,69 @@
+# engine/stats.py
+# 마스킹 한 번의 단계별 시간 / 카운터 (mask_pdf_bytes(..., stats=MaskStats()))
+# 단계: get_text → tokenize (Kiwi) → spans → merge → redact (그리기 포함) → save
+# 병렬 모드에서는 워커별 값을 합친 것이므로 단계 시간 합이 벽시계 시간보다 클 수 있다.
+import contextlib, time
+
+STAGES = ("get_text", "tokenize", "spans", "merge", "redact", "save")
+COUNTERS = ("pages", "lines", "tokens", "spans", "rects")
+
+
+class _Stage:
+    __slots__ = ("stats", "name", "t")
+
+    def __init__(self, stats, name):
+        self.stats, self.name = stats, name
+
+    def __enter__(self):
+        self.t = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.stats.timers[self.name] = self.stats.timers.get(self.name, 0.0) + time.perf_counter() - self.t
+
+
+class MaskStats:
+    def __init__(self):
+        self.timers = {}    # 단계 → 초
+        self.counters = {}  # 이름 → 개수
+
+    def __bool__(self):
+        return True
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def add(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other):
+        """as_dict() 결과(워커 프로세스에서 돌려받은 값)를 더한다"""
+        for name, sec in other["timers"].items(): self.timers[name] = self.timers.get(name, 0.0) + sec
+        for name, n in other["counters"].items(): self.add(name, n)
+
+    def as_dict(self):
+        return {"timers": dict(self.timers), "counters": dict(self.counters)}
+
+    def server_timing(self, **extra):
+        """Server-Timing 헤더 값 (ms). extra 는 단계 밖에서 잰 시간(초), 예: total=..."""
+        items = [(name, self.timers[name]) for name in STAGES if name in self.timers] + list(extra.items())
+        return ", ".join(f"{name};dur={sec * 1e3:.1f}" for name, sec in items)
+
+
+class _NullStats:
+    """stats 를 끈 경우. 분기 없이 부를 수 있고, bool 이 False 라 카운터 계산 자체를 건너뛸 수 있다"""
+    _STAGE = contextlib.nullcontext()
+
+    def __bool__(self):
+        return False
+
+    def stage(self, name):
+        return self._STAGE
+
+    def add(self, name, n=1):
+        pass
+
+    def merge(self, other):
+        pass
+
+
+NULL_STATS = _NullStats()
@@ -0,0 +1,167 @@
+# engine/tokenizer_service.py
+# Kiwi 를 노드에 하나만 올리는 로컬 토크나이저 데몬 + 클라이언트.
+#   python -m engine.tokenizer_service --socket /tmp/pdfmask-kiwi.sock
+#   MASK_TOKENIZER_SOCKET=/tmp/pdfmask-kiwi.sock gunicorn ...   # 엔진이 Kiwi 를 직접 올리지 않고 데몬에 보낸다
+# gunicorn 워커마다 Kiwi 모델(수백 MB)과 스레드 풀을 따로 두지 않아도 되고, 여러 요청에서 동시에 들어온 라인을
+# 짧은 창(window) 동안 모아 Kiwi 에 한 번에 넘기므로 작은 요청이 많을 때 Kiwi 스레드 풀을 더 잘 채운다.
+# 프로토콜: Unix 소켓, 4바이트 길이(big endian) + JSON. {"texts": [...]} → {"tokens": [[[form, tag, start, len], ...], ...]}
+import argparse, collections, json, logging, os, queue, socket, socketserver, struct, threading, time
+
+from engine.concurrency import available_cpus
+
+Token = collections.namedtuple("Token", "form tag start len")  # 엔진이 쓰는 kiwipiepy Token 속성만
+DEFAULT_SOCKET = "/tmp/pdfmask-kiwi.sock"
+logger = logging.getLogger("engine.tokenizer_service")
+
+
+def _send(sock, obj):
+    data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    sock.sendall(struct.pack(">I", len(data)) + data)
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk: raise ConnectionError("tokenizer connection closed")
+        buf += chunk
+    return bytes(buf)
+
+
+def _recv(sock):
+    (n,) = struct.unpack(">I", _recv_exact(sock, 4))
+    return json.loads(_recv_exact(sock, n))
+
+
+# ---- 서버 ----
+class _Batcher(threading.Thread):
+    """요청들을 window 초 동안(또는 max_lines 라인까지) 모아 Kiwi 에 한 번에 넘긴다"""
+    def __init__(self, kiwi, window, max_lines):
+        super().__init__(daemon=True)
+        self.kiwi, self.window, self.max_lines = kiwi, window, max_lines
+        self.queue = queue.Queue()
+        self.batches = self.requests = self.lines = 0
+
+    def submit(self, texts):
+        item = [texts, threading.Event(), None]
+        self.queue.put(item)
+        item[1].wait()
+        if isinstance(item[2], Exception): raise item[2]
+        return item[2]
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            n = len(batch[0][0]); deadline = time.monotonic() + self.window
+            while n < self.max_lines:
+                try: item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty: break
+                batch.append(item); n += len(item[0])
+            texts = [t for item in batch for t in item[0]]
+            try:
+                results = [[(t.form, t.tag, t.start, t.len) for t in tokens] for tokens in self.kiwi.tokenize(texts)]
+                pos = 0
+                for item in batch:
+                    item[2] = results[pos:pos + len(item[0])]; pos += len(item[0])
+            except Exception as e:
+                for item in batch: item[2] = e
+            self.batches += 1; self.requests += len(batch); self.lines += n
+            for item in batch: item[1].set()
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        batcher = self.server.batcher
+        while True:  # 연결 하나로 요청 여러 개
+            try: req = _recv(self.request)
+            except (ConnectionError, OSError): return
+            if "texts" not in req:  # ping: 상태
+                _send(self.request, {"ok": True, "batches": batcher.batches, "requests": batcher.requests,
+                                     "lines": batcher.lines})
+                continue
+            try: _send(self.request, {"tokens": batcher.submit(req["texts"]) if req["texts"] else []})
+            except Exception as e: _send(self.request, {"error": f"{type(e).__name__}: {e}"})
+
+
+class TokenizerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path=DEFAULT_SOCKET, kiwi=None, window=0.002, max_lines=4096, num_workers=-1):
+        if kiwi is None:
+            from kiwipiepy import Kiwi
+            kiwi = Kiwi(num_workers=num_workers)
+        if os.path.exists(path): os.remove(path)  # 이전 실행이 남긴 소켓 파일
+        super().__init__(path, _Handler)
+        self.path = path
+        self.batcher = _Batcher(kiwi, window, max_lines)
+        self.batcher.start()
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.path): os.remove(self.path)
+
+
+# ---- 클라이언트 ----
+class TokenizerClient:
+    """스레드마다 연결 하나를 유지. 데몬이 재시작돼 끊긴 연결은 한 번 다시 연결해 재시도한다 (시간 초과는 재시도 안 함)"""
+    def __init__(self, path, timeout=120.0):
+        self.path, self.timeout = path, timeout
+        self._local = threading.local()
+
+    def _conn(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            self._local.sock = sock
+        return sock
+
+    def _drop(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None: sock.close()
+        self._local.sock = None
+
+    def _call(self, obj):
+        # 다시 보내는 것은 연결이 끊긴 경우만 (데몬 재시작: 소켓 파일 없음 / 연결 거부 / 끊긴 파이프).
+        # 시간 초과는 데몬이 아직 그 요청을 처리 중일 수 있으므로 다시 보내지 않는다 (같은 배치를 두 번 큐에 넣고 대기도 두 배)
+        for attempt in (0, 1):
+            try:
+                sock = self._conn()
+                _send(sock, obj)
+                return _recv(sock)
+            except (ConnectionError, FileNotFoundError):
+                self._drop()
+                if attempt: raise
+            except OSError:  # TimeoutError 등: 늦게 온 응답이 다음 요청과 섞이지 않도록 연결만 버린다
+                self._drop()
+                raise
+
+    def tokenize(self, texts):
+        resp = self._call({"texts": list(texts)})
+        if "error" in resp: raise RuntimeError(f"tokenizer service: {resp['error']}")
+        return [[Token(*t) for t in tokens] for tokens in resp["tokens"]]
+
+    def ping(self):
+        return self._call({})
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m engine.tokenizer_service", description="공유 Kiwi 토크나이저 데몬")
+    ap.add_argument("--socket", default=os.getenv("MASK_TOKENIZER_SOCKET") or DEFAULT_SOCKET)
+    ap.add_argument("--window-ms", type=float, default=2.0, help="요청을 모으는 시간 (ms)")
+    ap.add_argument("--max-lines", type=int, default=4096, help="한 번에 Kiwi 에 넘길 최대 라인 수")
+    ap.add_argument("--threads", type=int, default=0, help="Kiwi 스레드 수 (0 = 쓸 수 있는 코어 수, cgroup 쿼터 반영)")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    threads = args.threads or available_cpus()  # 데몬 하나가 노드의 Kiwi 를 전부 맡는다
+    server = TokenizerServer(args.socket, window=args.window_ms / 1e3, max_lines=args.max_lines, num_workers=threads)
+    logger.info("listening on %s (window %.1f ms, max %d lines, %d Kiwi threads)", args.socket, args.window_ms,
+                args.max_lines, threads)
+    try: server.serve_forever()
+    except KeyboardInterrupt: pass
+    finally: server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "masker.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -55,6 +56,7 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {"timeout": 20},  # 작업 워커 프로세스들과 같이 쓰므로 잠금 대기 시간을 넉넉히
     }
 }
 
@@ -67,3 +69,57 @@ STATIC_URL = "static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# 이 크기(바이트)를 넘는 업로드는 메모리 대신 임시 파일에 받는다 → 엔진이 경로로 연다
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv("FILE_UPLOAD_MAX_MEMORY_SIZE", 1024 * 1024))
+
+# 이 크기(바이트) 이상 업로드는 스트리밍 모드로 응답 (메모리 사용량 일정)
+MASK_STREAM_THRESHOLD = int(os.getenv("MASK_STREAM_THRESHOLD", 20 * 1024 * 1024))
+
+# 문서 단위 결과 캐시 (sha256(입력) + 옵션 + seed). 디렉터리를 비우면 사용 안 함
+MASK_RESULT_CACHE_DIR = os.getenv("MASK_RESULT_CACHE_DIR", str(BASE_DIR / "var" / "result_cache"))
+MASK_RESULT_CACHE_MAX_BYTES = int(os.getenv("MASK_RESULT_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+MASK_RESULT_CACHE_TTL = int(os.getenv("MASK_RESULT_CACHE_TTL", 24 * 3600))  # 초, 0 = 만료 없음
+
+# 라인 span LRU 캐시 (engine/span_cache.py, 프로세스마다). 엔진도 같은 환경변수를 읽으므로 페이지 풀 자식에도 적용된다
+MASK_SPAN_CACHE_ENTRIES = int(os.getenv("MASK_SPAN_CACHE_ENTRIES", 50_000))
+MASK_SPAN_CACHE_BYTES = int(os.getenv("MASK_SPAN_CACHE_BYTES", 64 * 1024 * 1024))
+
+# 비동기 작업 (/jobs). 입력/결과 파일은 MASK_JOB_DIR/<job id>/ 에 저장. 실행은 `python manage.py mask_worker`
+MASK_JOB_DIR = os.getenv("MASK_JOB_DIR", str(BASE_DIR / "var" / "jobs"))
+MASK_JOB_CONCURRENCY = int(os.getenv("MASK_JOB_CONCURRENCY", 2))      # 워커 하나가 동시에 실행하는 작업 수 (작업 안은 직렬)
+MASK_JOB_MAX_QUEUED = int(os.getenv("MASK_JOB_MAX_QUEUED", 100))      # 대기+실행 중 작업 상한 (넘으면 503), 0 = 무제한
+MASK_JOB_MAX_ATTEMPTS = int(os.getenv("MASK_JOB_MAX_ATTEMPTS", 3))    # 워커가 죽어 다시 큐에 넣는 최대 횟수
+MASK_JOB_STALE_SECONDS = int(os.getenv("MASK_JOB_STALE_SECONDS", 60))  # heartbeat 이 이만큼 끊기면 죽은 워커로 판단
+MASK_JOB_TTL = int(os.getenv("MASK_JOB_TTL", 24 * 3600))              # 끝난 작업 보관 시간(초), 0 = 지우지 않음
+
+# /mask/batch: 파일 단위 병렬 처리 프로세스 수 (0/1 = 요청 안에서 직렬, 비우면 CPU 예산의 page_workers), 한 요청의 최대 파일 수,
+# 파일 하나의 최대 크기 (ZIP 안의 항목은 풀었을 때 기준, 0 = 무제한)
+MASK_BATCH_WORKERS = int(os.environ["MASK_BATCH_WORKERS"]) if os.getenv("MASK_BATCH_WORKERS") else None
+MASK_BATCH_MAX_FILES = int(os.getenv("MASK_BATCH_MAX_FILES", 500))
+MASK_BATCH_MAX_FILE_BYTES = int(os.getenv("MASK_BATCH_MAX_FILE_BYTES", 200 * 1024 * 1024))
+# Django 는 기본으로 요청당 업로드 파일 100개를 넘으면 TooManyFilesSent (빈 400) 를 낸다.
+# MASK_BATCH_MAX_FILES 를 넘는 파일도 manifest 에 skipped 로 남도록 그 두 배까지 받는다
+DATA_UPLOAD_MAX_NUMBER_FILES = int(os.getenv("DATA_UPLOAD_MAX_NUMBER_FILES", 2 * MASK_BATCH_MAX_FILES))
+
+# /mask 단계별 시간/카운터 (Server-Timing 헤더 + logger "masker" 에 요청당 JSON 한 줄)
+MASK_STATS = os.getenv("MASK_STATS", "1").lower() in ("1", "true", "yes", "on")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {"masker": {"handlers": ["console"], "level": os.getenv("MASK_LOG_LEVEL", "INFO")}},
+}
+
+# /metrics: 프로세스(gunicorn 워커)별 값을 모아 두는 디렉터리. 비우면 수집하지 않는다
+MASK_METRICS_DIR = os.getenv("MASK_METRICS_DIR", str(BASE_DIR / "var" / "metrics"))
+
+# 요청 단위 cProfile 캡처 (masker/profiling.py). 디렉터리를 비우면 끔.
+# MASK_PROFILE_TOKEN 을 X-Mask-Profile 헤더로 보낸 요청 + MASK_PROFILE_SAMPLE_RATE 비율의 요청
+MASK_PROFILE_DIR = os.getenv("MASK_PROFILE_DIR", str(BASE_DIR / "var" / "profiles"))
+MASK_PROFILE_TOKEN = os.getenv("MASK_PROFILE_TOKEN", "")
+MASK_PROFILE_SAMPLE_RATE = float(os.getenv("MASK_PROFILE_SAMPLE_RATE", 0.0))
+
+# 워커 워밍업 (masker/readiness.py). 끝날 때까지 /ready 가 503. 0 이면 워밍업 없이 바로 ready
+MASK_WARMUP = os.getenv("MASK_WARMUP", "1").lower() in ("1", "true", "yes", "on")
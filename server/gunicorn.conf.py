@@ -0,0 +1,41 @@
+# server/gunicorn.conf.py
+#   gunicorn -c server/gunicorn.conf.py config.wsgi:application
+# preload_app: 마스터가 Django + 엔진 모듈(PyMuPDF, numpy, 정규식/설정 테이블)을 한 번 import 하고 fork → 워커는 copy-on-write 로 공유.
+# Kiwi 모델은 마스터에서 올리지 않는다 (엔진이 lazy). Kiwi 스레드 풀은 fork 를 넘어가지 못하므로 워커마다 post_worker_init 에서
+# 워밍업 스레드로 올리고, 끝날 때까지 /ready 가 503. 노드에 Kiwi 를 하나만 두려면 MASK_TOKENIZER_SOCKET (README 참고).
+# 워커 수 / 워커 안의 Kiwi 스레드 / 페이지 풀은 CPU 예산 하나로 나눈다 (메모리가 모자라면 워커 수를 줄인다. engine/concurrency.py, MASK_CPUS 등으로 덮어쓰기)
+import os, sys
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(chdir))
+from engine.concurrency import budget, describe, resolve
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = budget().http_workers
+preload_app = os.getenv("GUNICORN_PRELOAD", "1").lower() in ("1", "true", "yes", "on")
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+
+
+def _budget(server):
+    # --workers 로 덮어쓴 경우 워커 안의 예산(Kiwi 스레드 수)도 실제 워커 수로 다시 나눈다
+    if server.cfg.workers == budget().http_workers: return budget()
+    return resolve(dict(os.environ, MASK_HTTP_WORKERS=str(server.cfg.workers)))
+
+
+def when_ready(server):
+    server.log.info("CPU budget: %s", describe(_budget(server)))
+    # Django 는 URLconf(→ views → 엔진)를 첫 요청 때 import 한다. preload 면 마스터에서 미리 import 해 워커가 공유하게
+    if server.cfg.preload_app:
+        from django.urls import get_resolver
+        get_resolver().url_patterns
+
+
+def post_fork(server, worker):
+    if server.cfg.workers != budget().http_workers:
+        os.environ["MASK_HTTP_WORKERS"] = str(server.cfg.workers)
+        budget.cache_clear()
+
+
+def post_worker_init(worker):
+    from masker import readiness
+    readiness.start()
@@ -0,0 +1,156 @@
+# server/masker/batch.py
+# /mask/batch: PDF 여러 개(또는 ZIP) → 마스킹 결과 ZIP 스트리밍
+# 입력은 임시 디렉터리에 하나씩 풀어 두고, 결과는 끝나는 대로(입력 순서) ZIP 항목으로 블록 단위로 흘려보낸다.
+# 메모리에는 ZIP 전체도, 결과 PDF 전체도 올라오지 않는다. 파일별 실패는 <이름>.error.txt + manifest.json 에 기록.
+import hashlib, json, os, posixpath, shutil, tempfile, time, zipfile
+
+from engine.mask_engine import iter_mask_files, page_count
+from . import metrics
+
+_BLOCK = 1024 * 1024
+
+
+class _ZipSink:
+    """ZipFile 이 쓰는 바이트를 모아 두었다가 drain() 으로 넘겨준다 (seek 불가 스트림 → ZipFile 이 data descriptor 사용)"""
+    def __init__(self):
+        self._buf = bytearray()
+
+    def write(self, data):
+        self._buf += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+
+def _is_zip(f):
+    if f.name.lower().endswith(".zip"):
+        return True
+    ok = zipfile.is_zipfile(f)
+    f.seek(0)
+    return ok
+
+
+def _safe_name(name):
+    # ZIP 안 경로 정리 (절대 경로 / .. 제거)
+    parts = [p for p in posixpath.normpath(name.replace("\\", "/")).split("/") if p not in ("", ".", "..")]
+    return "/".join(parts) or "file.pdf"
+
+
+def _spool(blocks, path, max_bytes=None):
+    """블록들을 path 에 쓰면서 sha256 을 계산. max_bytes 를 넘으면 ValueError (ZIP 폭탄 등)"""
+    h, size = hashlib.sha256(), 0
+    with open(path, "wb") as out:
+        for block in blocks:
+            size += len(block)
+            if max_bytes and size > max_bytes:
+                raise ValueError(f"file larger than {max_bytes} bytes")
+            h.update(block); out.write(block)
+    return h.hexdigest()
+
+
+def _zip_members(f):
+    """ZIP 업로드 → (항목 이름, 블록 함수, 건너뛴 이유). 안의 .pdf 만 처리, 열 수 없는 ZIP 은 항목 하나의 오류로"""
+    try:
+        zf = zipfile.ZipFile(f)
+    except Exception as e:  # BadZipFile, 잘린 파일 등
+        yield _safe_name(f.name), None, ("error", f"{type(e).__name__}: {e}")
+        return
+    with zf:
+        for info in zf.infolist():
+            if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                continue
+            if not info.filename.lower().endswith(".pdf"):
+                yield _safe_name(info.filename), None, ("skipped", "not a PDF")
+                continue
+            yield _safe_name(info.filename), (lambda info=info: _zip_blocks(zf, info)), None
+
+
+def _inputs(files, max_files):
+    """
+    업로드 목록 → (항목 이름, 블록 iterable 을 돌려주는 함수, 건너뛴 이유) 를 하나씩.
+    처리하지 않는 항목은 함수 대신 None 과 (status, 메시지). max_files 를 넘는 항목도 "skipped" 로 남긴다
+    """
+    count = 0
+    for f in files:
+        members = _zip_members(f) if _is_zip(f) else [(_safe_name(f.name), lambda f=f: f.chunks(_BLOCK), None)]
+        for name, blocks, reason in members:
+            count += 1
+            if count > max_files and blocks is not None:
+                blocks, reason = None, ("skipped", f"more than {max_files} files in one request")
+            yield name, blocks, reason
+
+
+def _zip_blocks(zf, info):
+    with zf.open(info) as member:
+        yield from iter(lambda: member.read(_BLOCK), b"")
+
+
+def iter_batch_zip(files, opts, workers=0, max_files=500, max_file_bytes=None):
+    """
+    결과 ZIP 바이트 블록 generator. 항목 이름은 입력 이름 그대로 (중복이면 뒤에 -2, -3 ...).
+    seed 를 주지 않으면 /mask 와 같이 파일마다 입력 해시에서 정하므로 같은 파일은 /mask 결과와 같다.
+    파일 하나(또는 ZIP 하나)가 실패해도 응답은 끝까지 가고, 실패는 그 항목의 .error.txt 와 manifest 에만 남는다.
+    """
+    tmp = tempfile.mkdtemp(prefix="pdfmask-batch-")
+    sink = _ZipSink()
+    zf = zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED)  # PDF 는 이미 압축돼 있다
+    manifest, names, entries = [], set(), {}
+
+    def unique(name):
+        stem, ext = os.path.splitext(name)
+        out, k = name, 1
+        while out in names:
+            k += 1; out = f"{stem}-{k}{ext}"
+        names.add(out)
+        return out
+
+    def items():
+        for i, (name, blocks, reason) in enumerate(_inputs(files, max_files)):
+            entry = {"name": name, "output": None, "status": "skipped", "error": None}
+            manifest.append(entry)
+            if blocks is None:
+                entry["status"], entry["error"] = reason
+                continue
+            src, dst = os.path.join(tmp, f"{i}.pdf"), os.path.join(tmp, f"{i}.out.pdf")
+            try:
+                digest = _spool(blocks(), src, max_file_bytes)
+            except Exception as e:  # 깨진 ZIP 항목, 크기 초과 등
+                entry.update(status="error", error=f"{type(e).__name__}: {e}")
+                if os.path.exists(src): os.remove(src)
+                continue
+            entries[dst] = entry, time.perf_counter()
+            item_opts = {} if opts.get("seed") is not None else {"seed": int(digest[:8], 16)}
+            yield src, dst, item_opts
+
+    try:
+        for src, dst, error in iter_mask_files(items(), workers=workers, **opts):
+            entry, started = entries.pop(dst)
+            if error is None:
+                # workers>1 이면 풀에서 차례를 기다린 시간도 들어간다
+                metrics.record_mask(page_count(src), time.perf_counter() - started, endpoint="batch")
+                entry.update(status="ok", output=unique(entry["name"]))
+                info = zipfile.ZipInfo(entry["output"])
+                info.file_size = os.path.getsize(dst)
+                with open(dst, "rb") as f, zf.open(info, "w") as w:
+                    for block in iter(lambda: f.read(_BLOCK), b""):
+                        w.write(block)
+                        yield sink.drain()
+            else:
+                metrics.record_error("mask_batch_api")
+                error = error.replace(src, entry["name"])  # 임시 경로는 응답에 내보내지 않는다
+                entry.update(status="error", error=error, output=unique(entry["name"] + ".error.txt"))
+                zf.writestr(entry["output"], error)
+            yield sink.drain()
+            for path in (src, dst):
+                if os.path.exists(path): os.remove(path)
+        zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+        zf.close()
+        yield sink.drain()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
@@ -0,0 +1,124 @@
+# server/masker/jobs.py
+# 비동기 마스킹 작업 큐. MaskJob 테이블(SQLite)이 큐이고, 실행은 `manage.py mask_worker` 가 맡는다.
+#   enqueue → (워커) claim → run_job → done/failed
+# 워커는 실행 중인 작업의 heartbeat_at 을 주기적으로 갱신한다. heartbeat 이 MASK_JOB_STALE_SECONDS 넘게 끊긴
+# running 작업은 죽은 워커의 것으로 보고 다시 큐에 넣는다 (MASK_JOB_MAX_ATTEMPTS 번까지).
+import os, shutil, time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from engine.mask_engine import mask_pdf_file
+from engine.result_cache import hash_file
+from . import metrics
+from .models import MaskJob
+
+
+class QueueFull(Exception):
+    pass
+
+
+def job_dir(job_id):
+    return os.path.join(settings.MASK_JOB_DIR, str(job_id))
+
+
+def enqueue(f, opts) -> MaskJob:
+    """업로드를 작업 디렉터리에 저장하고 큐에 넣는다. 대기+실행 중인 작업이 MASK_JOB_MAX_QUEUED 이상이면 QueueFull"""
+    limit = settings.MASK_JOB_MAX_QUEUED
+    if limit and MaskJob.objects.filter(status__in=(MaskJob.QUEUED, MaskJob.RUNNING)).count() >= limit:
+        raise QueueFull(f"too many pending jobs (limit {limit})")
+
+    digest = hash_file(f)
+    if opts.get("seed") is None:  # /mask 와 같은 규칙 → 같은 입력은 같은 결과
+        opts = dict(opts, seed=int(digest[:8], 16))
+    job = MaskJob(options=opts, sha256=digest)
+    os.makedirs(job_dir(job.id))
+    job.input_path = os.path.join(job_dir(job.id), "input.pdf")
+    with open(job.input_path, "wb") as out:
+        for chunk in (f.chunks() if hasattr(f, "chunks") else iter(lambda: f.read(1024 * 1024), b"")):
+            out.write(chunk)
+    job.save()
+    return job
+
+
+def claim(worker):
+    """가장 오래된 queued 작업 하나를 running 으로 바꾸고 id 를 반환 (없으면 None).
+    조건부 UPDATE 라 워커 여러 개가 같은 작업을 동시에 가져가지 않는다"""
+    while True:
+        job_id = (MaskJob.objects.filter(status=MaskJob.QUEUED)
+                  .order_by("created_at").values_list("id", flat=True).first())
+        if job_id is None:
+            return None
+        now = timezone.now()
+        taken = MaskJob.objects.filter(pk=job_id, status=MaskJob.QUEUED).update(
+            status=MaskJob.RUNNING, worker=worker, started_at=now, heartbeat_at=now, attempts=F("attempts") + 1)
+        if taken:
+            return job_id
+
+
+def run_job(job_id, worker):
+    """
+    작업 하나 실행 (워커 자식 프로세스에서 호출). 진행률은 구간이 끝날 때마다 DB 에 기록.
+    모든 갱신은 이번 시도(claim 한 worker 와 attempts)가 아직 그 작업을 쥐고 있을 때만 반영한다 —
+    release 로 다시 큐에 들어간 뒤의 새 시도를 늦게 끝난 이전 실행이 덮어쓰지 않도록.
+    메트릭은 이 프로세스의 MASK_METRICS_DIR/<pid>.json 으로 (/metrics 가 웹 워커 것과 합친다)
+    """
+    job = MaskJob.objects.get(pk=job_id)
+    if job.status != MaskJob.RUNNING or job.worker != worker:
+        return
+    mine = MaskJob.objects.filter(pk=job_id, status=MaskJob.RUNNING, worker=worker, attempts=job.attempts)
+
+    def progress(done, total):
+        mine.update(pages_done=done, page_count=total)
+
+    started = time.perf_counter()
+    try:
+        path = os.path.join(job_dir(job_id), "output.pdf")
+        pages = mask_pdf_file(job.input_path, path + ".part", progress=progress, **job.options)
+        os.replace(path + ".part", path)
+    except Exception as e:
+        if os.path.exists(path + ".part"): os.remove(path + ".part")
+        mine.update(status=MaskJob.FAILED, error=f"{type(e).__name__}: {e}", finished_at=timezone.now())
+        metrics.record_error("jobs")  # /mask 가 엔진 예외를 400 으로 돌려줄 때와 같은 카운터
+        metrics.REGISTRY.flush()
+        return
+    mine.update(status=MaskJob.DONE, output_path=path, error="", finished_at=timezone.now())
+    metrics.record_mask(pages, time.perf_counter() - started, endpoint="jobs")
+    metrics.REGISTRY.flush()
+
+
+def release(job_id, error):
+    """워커 쪽 사고(자식 프로세스가 죽는 등)로 끝나지 못한 작업: 재시도 횟수가 남았으면 다시 큐로, 아니면 실패"""
+    now = timezone.now()
+    job = MaskJob.objects.filter(pk=job_id, status=MaskJob.RUNNING)
+    job.filter(attempts__gte=settings.MASK_JOB_MAX_ATTEMPTS).update(
+        status=MaskJob.FAILED, error=error, finished_at=now)
+    job.update(status=MaskJob.QUEUED, worker="", error=error)
+
+
+def heartbeat(job_ids):
+    if job_ids:
+        MaskJob.objects.filter(pk__in=list(job_ids), status=MaskJob.RUNNING).update(heartbeat_at=timezone.now())
+
+
+def recover_stale():
+    """heartbeat 이 끊긴 running 작업(재시작/강제 종료된 워커)을 다시 큐에 넣는다. 되살린 작업 수를 반환"""
+    cutoff = timezone.now() - timedelta(seconds=settings.MASK_JOB_STALE_SECONDS)
+    stale = list(MaskJob.objects.filter(status=MaskJob.RUNNING, heartbeat_at__lt=cutoff).values_list("id", flat=True))
+    for job_id in stale: release(job_id, "worker stopped responding")
+    return len(stale)
+
+
+def purge():
+    """MASK_JOB_TTL 이 지난 완료/실패 작업과 파일을 지운다"""
+    ttl = settings.MASK_JOB_TTL
+    if ttl <= 0:
+        return 0
+    old = MaskJob.objects.filter(status__in=(MaskJob.DONE, MaskJob.FAILED),
+                                 finished_at__lt=timezone.now() - timedelta(seconds=ttl))
+    ids = list(old.values_list("id", flat=True))
+    for job_id in ids: shutil.rmtree(job_dir(job_id), ignore_errors=True)
+    MaskJob.objects.filter(pk__in=ids).delete()
+    return len(ids)
@@ -0,0 +1,76 @@
+# server/masker/management/commands/mask_worker.py
+# 비동기 마스킹 작업 워커
+#   python manage.py mask_worker [--concurrency 2]
+# 작업마다 spawn 자식 프로세스에서 실행 (Kiwi/PyMuPDF 는 프로세스마다 따로 올라간다).
+# 동시에 실행하는 작업 수는 --concurrency (기본 MASK_JOB_CONCURRENCY) 로 제한.
+import multiprocessing, os, socket, time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from masker import jobs
+
+_MAINTENANCE_EVERY = 5.0  # 초. heartbeat / 죽은 작업 회수 / 오래된 작업 정리 주기
+
+
+class Command(BaseCommand):
+    help = "비동기 마스킹 작업(/jobs) 워커"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=settings.MASK_JOB_CONCURRENCY,
+                            help="동시에 실행할 작업 수")
+        parser.add_argument("--poll", type=float, default=1.0, help="큐가 비었을 때 다시 확인하는 간격(초)")
+        parser.add_argument("--once", action="store_true", help="큐가 빌 때까지만 처리하고 종료")
+
+    def handle(self, *args, concurrency, poll, once, **options):
+        concurrency = max(1, concurrency)
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.stdout.write(f"mask_worker {worker} concurrency={concurrency}")
+        pool = self._pool(concurrency)
+        running = {}  # future → job id
+        last = 0.0
+        try:
+            while True:
+                if time.monotonic() - last >= _MAINTENANCE_EVERY:
+                    jobs.heartbeat(running.values())
+                    recovered = jobs.recover_stale()
+                    if recovered: self.stdout.write(f"requeued {recovered} stale job(s)")
+                    jobs.purge()
+                    last = time.monotonic()
+
+                while len(running) < concurrency:
+                    job_id = jobs.claim(worker)
+                    if job_id is None: break
+                    running[pool.submit(jobs.run_job, job_id, worker)] = job_id
+
+                if not running:
+                    if once: break
+                    time.sleep(poll)
+                    continue
+
+                done, _ = wait(running, timeout=poll, return_when=FIRST_COMPLETED)
+                broken = False
+                for fut in done:
+                    job_id = running.pop(fut)
+                    exc = fut.exception()
+                    if exc is not None:  # run_job 의 try 밖에서 난 실패 (DB 오류, 자식 프로세스가 죽는 등)
+                        jobs.release(job_id, f"{type(exc).__name__}: {exc}")
+                        broken = broken or isinstance(exc, BrokenProcessPool)
+                if broken:  # 죽은 자식이 있으면 풀 전체가 망가지므로 남은 작업도 돌려놓고 새로 만든다.
+                    # 그 밖의 예외는 그 작업만 돌려놓는다 (살아 있는 자식이 돌리는 작업을 다시 큐에 넣으면 두 번 실행된다)
+                    for job_id in running.values(): jobs.release(job_id, "worker pool restarted")
+                    running.clear()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self._pool(concurrency)
+        finally:
+            for job_id in running.values(): jobs.release(job_id, "worker shut down")
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _pool(concurrency):
+        # fork 는 Kiwi 스레드 풀을 망가뜨리므로 spawn. 자식은 Django 를 다시 설정하고 나서 작업을 받는다
+        return ProcessPoolExecutor(max_workers=concurrency, initializer=django.setup,
+                                   mp_context=multiprocessing.get_context("spawn"))
@@ -0,0 +1,209 @@
+# server/masker/metrics.py
+# /metrics (Prometheus text format). gunicorn 워커처럼 프로세스가 여러 개여도 한 화면에 합쳐 보이도록
+# 프로세스마다 자기 값을 MASK_METRICS_DIR/<pid>.json 에 통째로 덮어쓰고, /metrics 는 디렉터리 전체를 더해서 보여준다.
+#   counter / histogram: 프로세스별 누적값을 더한다. 죽은 프로세스 파일은 _dead.json 에 합쳐 두므로 값이 줄지 않는다
+#   gauge (in-flight): 살아 있는 프로세스 것만 더한다
+# 파일 쓰기는 요청 시작/끝에 한 번씩 (tmp → os.replace 라 읽는 쪽이 반쯤 쓴 파일을 보지 않는다).
+import fcntl, glob, json, os, threading
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from engine.mask_engine import span_cache_stats
+
+# 이름 → (type, help)
+METRICS = {
+    "masker_requests_total": ("counter", "HTTP requests by view and status"),
+    "masker_request_errors_total": ("counter", "Errors by view and reason (5xx = unhandled/5xx, engine = mask failure returned as 400)"),
+    "masker_in_flight_requests": ("gauge", "Requests currently being handled"),
+    "masker_request_bytes_total": ("counter", "Request body bytes received"),
+    "masker_response_bytes_total": ("counter", "Response body bytes sent"),
+    "masker_mask_duration_seconds": ("histogram", "Time per document by endpoint and page-count bucket"),
+    "masker_mask_pages_total": ("counter", "Input pages processed by endpoint"),
+    "masker_stage_seconds_total": ("counter", "Engine time per stage (tokenize = Kiwi)"),
+    "masker_result_cache_requests_total": ("counter", "Result cache lookups by result"),
+    "masker_span_cache_requests_total": ("counter", "Line span cache lookups by result"),
+}
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+PAGE_BUCKETS = ((10, "1-10"), (50, "11-50"), (200, "51-200"), (1000, "201-1000"))
+
+
+def page_bucket(pages):
+    if not pages: return "unknown"
+    for limit, label in PAGE_BUCKETS:
+        if pages <= limit: return label
+    return "1001+"
+
+
+class _Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = {}  # "이름|label=값,..." → float, 히스토그램은 [bucket 별 개수..., sum, count]
+
+    @staticmethod
+    def _key(name, labels):
+        return name + "|" + ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock: self.values[key] = self.values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock: self.values[self._key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            h = self.values.setdefault(key, [0] * (len(DURATION_BUCKETS) + 2))
+            for i, le in enumerate(DURATION_BUCKETS):
+                if value <= le: h[i] += 1
+            h[-2] += value; h[-1] += 1
+
+    def flush(self):
+        directory = getattr(settings, "MASK_METRICS_DIR", None)
+        if not directory: return
+        span = span_cache_stats()
+        self.set("masker_span_cache_requests_total", span["hits"], result="hit")
+        self.set("masker_span_cache_requests_total", span["misses"], result="miss")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        with self._lock: data = json.dumps(self.values)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f: f.write(data)
+        os.replace(tmp, path)
+
+
+REGISTRY = _Registry()
+
+
+def _alive(pid):
+    try: os.kill(pid, 0)
+    except ProcessLookupError: return False
+    except PermissionError: pass
+    return True
+
+
+def _add(total, values, gauges=True):
+    for key, v in values.items():
+        if not gauges and METRICS[key.split("|", 1)[0]][0] == "gauge": continue
+        if isinstance(v, list):
+            cur = total.setdefault(key, [0] * len(v))
+            for i, x in enumerate(v): cur[i] += x
+        else:
+            total[key] = total.get(key, 0) + v
+
+
+def collect(directory):
+    """디렉터리의 프로세스별 값을 합친다. 죽은 프로세스 파일은 (gauge 를 빼고) _dead.json 으로 옮겨 합친다"""
+    os.makedirs(directory, exist_ok=True)
+    dead_path = os.path.join(directory, "_dead.json")
+    with open(os.path.join(directory, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(dead_path) as f: dead = json.load(f)
+        except (FileNotFoundError, ValueError):
+            dead = {}
+        total, moved = {}, False
+        for path in glob.glob(os.path.join(directory, "[0-9]*.json")):
+            try:
+                with open(path) as f: values = json.load(f)
+            except (FileNotFoundError, ValueError):
+                continue
+            if _alive(int(os.path.basename(path).split(".")[0])):
+                _add(total, values)
+            else:
+                _add(dead, values, gauges=False); os.remove(path); moved = True
+        if moved:
+            with open(dead_path + ".tmp", "w") as f: json.dump(dead, f)
+            os.replace(dead_path + ".tmp", dead_path)
+        _add(total, dead)
+    return total
+
+
+def _labels(text, extra=""):
+    parts = [f'{k}="{v}"' for k, v in (p.split("=", 1) for p in text.split(",") if p)]
+    if extra: parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render(values):
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        series = sorted((k.split("|", 1)[1], v) for k, v in values.items() if k.split("|", 1)[0] == name)
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        if kind == "gauge" and not series: series = [("", 0)]
+        for labels, v in series:
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(labels)} {v:g}")
+                continue
+            for le, n in zip([f"{le:g}" for le in DURATION_BUCKETS] + ["+Inf"], v[:-2] + [v[-1]]):
+                lines.append(f"{name}_bucket{_labels(labels, 'le=' + json.dumps(le))} {n:g}")
+            lines.append(f"{name}_sum{_labels(labels)} {v[-2]:g}")
+            lines.append(f"{name}_count{_labels(labels)} {v[-1]:g}")
+    return "\n".join(lines) + "\n"
+
+
+def record_mask(pages, seconds, cache=None, timers=None, endpoint="mask"):
+    """
+    문서 한 건 (endpoint: mask | batch | jobs | analyze | render). 요청 단위 값은 MetricsMiddleware 가 따로 기록한다.
+    pages 는 입력 문서의 페이지 수 (MASK_STATS 나 캐시 적중과 상관없이)
+    """
+    REGISTRY.observe("masker_mask_duration_seconds", seconds, endpoint=endpoint, pages=page_bucket(pages))
+    REGISTRY.inc("masker_mask_pages_total", pages or 0, endpoint=endpoint)
+    if cache in ("hit", "miss"): REGISTRY.inc("masker_result_cache_requests_total", result=cache)
+    for stage, sec in (timers or {}).items(): REGISTRY.inc("masker_stage_seconds_total", sec, stage=stage)
+
+
+def record_error(view, reason="engine"):
+    """뷰가 잡아서 400 으로 돌려준 엔진 예외 (MetricsMiddleware 는 5xx 만 센다). batch 는 실패한 파일마다"""
+    REGISTRY.inc("masker_request_errors_total", view=view, reason=reason)
+
+
+class MetricsMiddleware:
+    """모든 요청의 수 / 상태 / in-flight / 바이트. MASK_METRICS_DIR 가 비어 있으면 아무것도 안 한다"""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, "MASK_METRICS_DIR", None):
+            return self.get_response(request)
+        REGISTRY.inc("masker_in_flight_requests", 1); REGISTRY.flush()
+        try:
+            response = self.get_response(request)
+        except Exception:
+            self._done(request, 500, 0)
+            raise
+        size = response.get("Content-Length")
+        if size is not None or not response.streaming:
+            self._done(request, response.status_code, int(size) if size is not None else len(response.content))
+        else:  # 스트리밍: 다 보낸 뒤에 기록
+            response.streaming_content = self._count(request, response.status_code, response.streaming_content)
+        return response
+
+    def _count(self, request, status, blocks):
+        sent = 0
+        try:
+            for block in blocks:
+                sent += len(block)
+                yield block
+        finally:
+            self._done(request, status, sent)
+
+    @staticmethod
+    def _done(request, status, bytes_out):
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name.rsplit(".", 1)[-1] if match else "unmatched"
+        REGISTRY.inc("masker_requests_total", view=view, status=status)
+        if status >= 500: REGISTRY.inc("masker_request_errors_total", view=view, reason="5xx")
+        REGISTRY.inc("masker_request_bytes_total", int(request.META.get("CONTENT_LENGTH") or 0))
+        REGISTRY.inc("masker_response_bytes_total", bytes_out)
+        REGISTRY.inc("masker_in_flight_requests", -1)
+        REGISTRY.flush()
+
+
+def metrics_view(request):
+    directory = getattr(settings, "MASK_METRICS_DIR", None)
+    if not directory:
+        return HttpResponse("metrics disabled (MASK_METRICS_DIR is empty)\n", status=404, content_type="text/plain")
+    REGISTRY.flush()
+    return HttpResponse(render(collect(directory)), content_type="text/plain; version=0.0.4; charset=utf-8")
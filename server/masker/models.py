@@ -0,0 +1,42 @@
+# server/masker/models.py
+
+import uuid
+
+from django.db import models
+
+
+class MaskJob(models.Model):
+    """비동기 마스킹 작업. 테이블 자체가 큐 (status=queued 를 created_at 순으로 꺼낸다)"""
+    QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+    STATUS_CHOICES = [(QUEUED, "queued"), (RUNNING, "running"), (DONE, "done"), (FAILED, "failed")]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    options = models.JSONField(default=dict)          # 엔진 옵션 (seed 포함)
+    sha256 = models.CharField(max_length=64)          # 입력 PDF 해시
+    input_path = models.CharField(max_length=500)
+    output_path = models.CharField(max_length=500, blank=True)
+    pages_done = models.IntegerField(default=0)
+    page_count = models.IntegerField(default=0)
+    attempts = models.IntegerField(default=0)         # 워커가 가져간 횟수 (죽은 워커의 작업은 다시 큐로)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["created_at"]
+
+    def as_dict(self):
+        return {
+            "id": str(self.id),
+            "status": self.status,
+            "progress": {"pages_done": self.pages_done, "page_count": self.page_count},
+            "attempts": self.attempts,
+            "error": self.error or None,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -0,0 +1,58 @@
+# server/masker/profiling.py
+# 요청 단위 프로파일 캡처 (cProfile). 느린 PDF 를 손으로 재현하지 않아도 되도록 서버에서 바로 떠 둔다.
+#   - 강제: MASK_PROFILE_TOKEN 을 아는 사람(관리자)만. 헤더 X-Mask-Profile: <token> 로만 (쿼리스트링은 접근 로그·Referer 에 남으므로 받지 않는다)
+#   - 샘플링: MASK_PROFILE_SAMPLE_RATE (0.0 ~ 1.0) 비율의 요청을 자동으로
+# 결과: MASK_PROFILE_DIR/<시각>-<sha256 앞 12자리>.prof (pstats / snakeviz 로 열기) + 같은 이름 .json (입력 해시, 옵션, 단계별 시간)
+import cProfile, hmac, json, os, random, time
+
+from django.conf import settings
+
+
+def reason(request):
+    """이 요청을 프로파일할 이유 ("forced" | "sampled") 또는 None"""
+    if not getattr(settings, "MASK_PROFILE_DIR", None):
+        return None
+    token = getattr(settings, "MASK_PROFILE_TOKEN", "")
+    given = request.headers.get("X-Mask-Profile")
+    if token and given and hmac.compare_digest(given, token):
+        return "forced"
+    rate = float(getattr(settings, "MASK_PROFILE_SAMPLE_RATE", 0.0))
+    if rate > 0 and random.random() < rate:
+        return "sampled"
+    return None
+
+
+class Capture:
+    """with 블록마다 프로파일러를 켜고 끈다 (스트리밍 응답은 블록 하나 만들 때마다 들어온다). 다 끝나면 save()"""
+    def __init__(self, digest, opts, why):
+        self.digest, self.opts, self.why = digest, opts, why
+        self.name = time.strftime("%Y%m%d-%H%M%S") + f"-{digest[:12]}"
+        self.profile = cProfile.Profile()
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self._t = time.perf_counter()
+        self.profile.enable()
+
+    def __exit__(self, *exc):
+        self.profile.disable()
+        self.seconds += time.perf_counter() - self._t
+
+    def wrap(self, blocks):
+        blocks = iter(blocks)
+        while True:
+            with self:
+                block = next(blocks, None)
+            if block is None: break
+            yield block
+
+    def save(self, stats=None):
+        directory = settings.MASK_PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.name)
+        self.profile.dump_stats(path + ".prof")
+        meta = {"sha256": self.digest, "options": self.opts, "reason": self.why, "seconds": round(self.seconds, 3),
+                "stages": stats.as_dict() if stats is not None else None}
+        with open(path + ".json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        return path + ".prof"
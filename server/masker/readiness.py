@@ -0,0 +1,60 @@
+# server/masker/readiness.py
+# /ready: 이 워커가 요청을 받을 준비가 됐는지 (로드밸런서 / k8s readinessProbe 용). /health 는 프로세스가 떠 있는지만 본다.
+# 엔진은 import 만 해 두고 (Kiwi 는 lazy) 워밍업(engine.mask_engine.warmup)은 워커마다 백그라운드 스레드에서 한 번 돌린다.
+#   gunicorn: gunicorn.conf.py 의 post_worker_init 에서 start() (--preload 여도 fork 뒤 워커 안에서)
+#   runserver 등: 첫 /ready 호출이 start() 한다
+# MASK_WARMUP=0 이면 워밍업 없이 바로 ready (첫 요청이 Kiwi 로드 비용을 떠안는다)
+import logging, os, threading
+
+from django.conf import settings
+from django.http import JsonResponse
+
+logger = logging.getLogger("masker")
+_LOCK = threading.Lock()
+_STATE = {"status": "cold", "seconds": None, "error": None}  # cold → warming → ready | failed
+
+
+def start():
+    """워밍업 스레드를 띄운다. 이미 돌고 있거나 끝났으면 아무것도 안 한다 (실패했으면 다시 시도)"""
+    if not getattr(settings, "MASK_WARMUP", True):
+        _STATE["status"] = "ready"
+        return
+    with _LOCK:
+        if _STATE["status"] not in ("cold", "failed"): return
+        _STATE.update(status="warming", error=None)
+    threading.Thread(target=_run, name="mask-warmup", daemon=True).start()
+
+
+def _run():
+    from engine.concurrency import describe
+    from engine.mask_engine import warmup
+    try:
+        seconds = warmup()
+    except Exception as e:
+        logger.exception("warmup failed")
+        _STATE.update(status="failed", error=f"{type(e).__name__}: {e}")
+        return
+    _STATE.update(status="ready", seconds=round(seconds, 3))
+    logger.info(f"warmup done in {seconds:.2f}s (pid {os.getpid()}, {describe()})")
+
+
+def _reset():
+    # --preload 마스터에서 워밍업했더라도 fork 된 워커의 엔진은 Kiwi 를 다시 올려야 한다 (mask_engine._after_fork)
+    global _LOCK
+    _LOCK = threading.Lock()
+    _STATE.update(status="cold", seconds=None, error=None)
+
+
+os.register_at_fork(after_in_child=_reset)
+
+
+def is_ready():
+    return _STATE["status"] == "ready"
+
+
+def ready_view(request):
+    if _STATE["status"] in ("cold", "failed"): start()
+    body = {"status": _STATE["status"], "pid": os.getpid()}
+    if _STATE["seconds"] is not None: body["warmup_seconds"] = _STATE["seconds"]
+    if _STATE["error"]: body["error"] = _STATE["error"]
+    return JsonResponse(body, status=200 if is_ready() else 503)
@@ -1,11 +1,21 @@
 # D:\AI\PDFmask\server\masker\urls.py
 
 from django.urls import path
-from .views import health, mask_api, upload_form
+from .metrics import metrics_view
+from .readiness import ready_view
+from .views import health, mask_api, mask_batch_api, upload_form, analyze_api, render_api, jobs_api, job_status, job_result
 
 urlpatterns = [
     path("", upload_form),       # 루트에서 업로드 폼 표시
     path("health", health),
+    path("ready", ready_view),   # 워밍업(Kiwi 로드 + 작은 PDF 마스킹)이 끝나야 200, 그 전엔 503
+    path("metrics", metrics_view),  # Prometheus text format (모든 워커 프로세스 합계)
     path("mask", mask_api),      # API 방식 (curl/postman용)
+    path("mask/batch", mask_batch_api),  # 여러 PDF(또는 ZIP) → 결과 ZIP 스트리밍
+    path("analyze", analyze_api),  # 마스크 플랜(JSON)만 생성
+    path("render", render_api),    # 플랜 → PDF (Kiwi 분석 없이 다시 그리기)
     path("upload", upload_form), # 별도 경로에서도 접근 가능
+    path("jobs", jobs_api),                             # 비동기 작업 등록 → 202 + id
+    path("jobs/<uuid:job_id>", job_status),             # 상태 / 진행률
+    path("jobs/<uuid:job_id>/result", job_result),      # 결과 PDF
 ]
@@ -1,10 +1,179 @@
 # D:\AI\PDFmask\server\masker\views.py
-from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest
+import contextlib, itertools, json, logging, tempfile, time
+
+from django.conf import settings
+from django.http import JsonResponse, HttpResponseBadRequest, StreamingHttpResponse, FileResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import render
 
-from engine.mask_engine import mask_pdf_bytes
+from engine.mask_engine import (LAYOUTS, REDACT_PROFILES, SAVE_PROFILES, mask_pdf_file, iter_mask_pdf, analyze_pdf,
+                                render_pdf, configure_span_cache)
+from engine.concurrency import budget
+from engine.keywords import read_keywords
+from engine.result_cache import ResultCache, cache_key, hash_file
+from engine.stats import MaskStats
+from . import jobs, metrics, profiling
+from .batch import iter_batch_zip
+from .models import MaskJob
+
+_RESULT_CACHE = None
+logger = logging.getLogger("masker")
+configure_span_cache(getattr(settings, "MASK_SPAN_CACHE_ENTRIES", None), getattr(settings, "MASK_SPAN_CACHE_BYTES", None))
+
+
+def _parse_opts(request):
+    """쿼리스트링 또는 form field → 엔진 옵션. 빈 값은 생략한 것으로 보고, 잘못된 값은 ValueError"""
+    def _get(name):
+        v = request.POST.get(name, request.GET.get(name))
+        return None if v is None or v == "" else v
+
+    opts = {}
+    for name in ("mode", "target_mode"):
+        if _get(name) is not None:
+            opts[name] = _get(name)
+
+    for name, choices in (("save_profile", SAVE_PROFILES), ("layout", LAYOUTS), ("redact_profile", REDACT_PROFILES)):
+        v = _get(name)
+        if v is not None:
+            if v not in choices:
+                raise ValueError(f"{name} must be one of {'|'.join(choices)}")
+            opts[name] = v
+
+    for name, conv, kind in (("mask_ratio", float, "float"), ("min_mask_len", int, "int"), ("seed", int, "int")):
+        v = _get(name)
+        if v is not None:
+            try:
+                opts[name] = conv(v)
+            except ValueError:
+                raise ValueError(f"{name} must be {kind}")
+
+    ans = _get("allow_noun_span")
+    if ans is not None:
+        opts["allow_noun_span"] = str(ans).lower() in ("1", "true", "yes", "on")
+
+    # target_mode=keywords 의 단어 목록: 텍스트 파일(한 줄에 하나) 또는 줄바꿈/쉼표로 구분한 field
+    kw_file = request.FILES.get("keywords")
+    if kw_file is not None:
+        opts["keywords"] = read_keywords(kw_file.read().decode("utf-8-sig").splitlines())
+    elif _get("keywords") is not None:
+        opts["keywords"] = read_keywords(_get("keywords").replace(",", "\n").splitlines())
+    if opts.get("target_mode") == "keywords" and not opts.get("keywords"):
+        raise ValueError("target_mode=keywords needs keywords (text file or newline/comma separated field)")
+    return opts
+
+
+def _upload_source(f):
+    # 디스크에 임시 저장된 업로드(FILE_UPLOAD_MAX_MEMORY_SIZE 초과)는 경로로 넘겨 bytes 복사를 피한다
+    return f.temporary_file_path() if hasattr(f, "temporary_file_path") else f.read()
+
+
+def _result_cache():
+    """settings.MASK_RESULT_CACHE_DIR 가 비어 있으면 캐시 사용 안 함"""
+    global _RESULT_CACHE
+    directory = getattr(settings, "MASK_RESULT_CACHE_DIR", None)
+    if not directory:
+        return None
+    if _RESULT_CACHE is None or _RESULT_CACHE.directory != str(directory):
+        _RESULT_CACHE = ResultCache(
+            directory,
+            max_bytes=getattr(settings, "MASK_RESULT_CACHE_MAX_BYTES", 1024 * 1024 * 1024),
+            ttl=getattr(settings, "MASK_RESULT_CACHE_TTL", 24 * 3600),
+        )
+    return _RESULT_CACHE
+
+
+def _tee_to_cache(blocks, cache, key, meta):
+    # 스트리밍 결과도 흘려보내면서 캐시에 기록 (끝까지 전송된 경우에만 캐시에 남는다)
+    with cache.writer(key, meta) as w:
+        for block in blocks:
+            w.write(block)
+            yield block
+
+
+def _log_mask(digest, f, pages, stats, started, cache, stream, bytes_out):
+    """요청 하나당 JSON 한 줄 (logger "masker"). pages 는 엔진 반환값 / 캐시 메타데이터에서 (MASK_STATS=0 이어도 남도록)"""
+    record = {"event": "mask", "sha256": digest[:16], "bytes_in": f.size, "bytes_out": bytes_out,
+              "cache": cache, "stream": stream, "total_ms": round((time.perf_counter() - started) * 1e3, 1)}
+    if stats is not None:
+        record["stages_ms"] = {k: round(v * 1e3, 1) for k, v in stats.timers.items()}
+        record.update(stats.counters)
+    record["pages"] = pages
+    logger.info(json.dumps(record))
+    metrics.record_mask(pages, record["total_ms"] / 1e3, cache, stats.timers if stats else {})
+
+
+def _log_when_done(blocks, log):
+    # 스트리밍 응답은 끝까지 보낸 뒤에 기록 (헤더는 이미 나갔으므로 Server-Timing 은 없다)
+    sent = 0
+    for block in blocks:
+        sent += len(block)
+        yield block
+    log(sent)
+
+
+def _mask_response(f, opts, profile=None):
+    """
+    같은 입력 + 같은 옵션(+ seed)은 결과 캐시에서 바로 반환 (fitz/Kiwi 를 거치지 않음).
+    seed 를 주지 않으면 입력 해시에서 만들어 결과가 재현 가능하도록 한다.
+
+    업로드 크기가 MASK_STREAM_THRESHOLD 이상이면 스트리밍 모드로 구간별로 흘려보내고,
+    작으면 기존처럼 한 번에 만들어 반환
+
+    MASK_STATS 가 켜져 있으면 단계별 시간을 Server-Timing 헤더와 로그 한 줄로 남긴다
+    profile (profiling.reason 결과) 이 있으면 엔진 실행을 cProfile 로 떠서 MASK_PROFILE_DIR 에 저장
+    페이지 풀 크기는 CPU 예산의 page_workers (engine/concurrency.py, 0 = 직렬). 결과 캐시 키에는 들어가지 않는다.
+    프로파일하는 요청은 직렬로 (풀 자식 프로세스 안의 시간은 cProfile 에 잡히지 않는다)
+    """
+    started = time.perf_counter()
+    stats = MaskStats() if getattr(settings, "MASK_STATS", True) else None
+    digest = hash_file(f)
+    if opts.get("seed") is None:
+        opts = dict(opts, seed=int(digest[:8], 16))
+    opts = dict(opts, workers=budget().page_workers)
+    cache = _result_cache()
+    key = cache_key(digest, opts)
+
+    hit = cache.open(key) if cache else None
+    # 캐시 적중은 엔진을 거치지 않으므로 프로파일할 것이 없다
+    capture = profiling.Capture(digest, dict(opts, workers=0), profile) if profile and hit is None else None
+    if capture: opts = capture.opts
+    if hit is not None:
+        resp = FileResponse(hit, content_type="application/pdf")
+        resp["X-Mask-Cache"] = "hit"
+        resp["Server-Timing"] = f"total;dur={(time.perf_counter() - started) * 1e3:.1f}"
+        _log_mask(digest, f, cache.meta(key).get("pages"), None, started, "hit", False, None)
+    elif f.size < getattr(settings, "MASK_STREAM_THRESHOLD", 20 * 1024 * 1024):
+        # 입력은 업로드 임시 파일 경로, 결과는 임시 파일 → 요청당 메모리에 문서 전체 사본을 두지 않는다
+        out = tempfile.TemporaryFile()
+        with capture or contextlib.nullcontext():
+            pages = mask_pdf_file(_upload_source(f), out, stats=stats, **opts)
+        if capture: capture.save(stats)
+        size = out.tell()
+        if cache:
+            out.seek(0); cache.put_file(key, out, {"pages": pages})
+        out.seek(0)
+        resp = FileResponse(out, content_type="application/pdf")  # 응답이 끝나면 닫히고, 닫히면 지워진다
+        if stats is not None:
+            resp["Server-Timing"] = stats.server_timing(total=time.perf_counter() - started)
+        _log_mask(digest, f, pages, stats, started, "miss" if cache else "off", False, size)
+    else:
+        meta = {}  # 구간이 끝날 때마다 전체 페이지 수를 채운다 (캐시 메타데이터 겸 로그)
+        blocks = iter_mask_pdf(_upload_source(f), stats=stats, progress=lambda done, total: meta.update(pages=total),
+                               **opts)
+        if capture: blocks = capture.wrap(blocks)
+        first = next(blocks)  # 첫 구간의 오류는 응답 시작 전에 드러나도록 미리 계산
+        blocks = itertools.chain([first], blocks)
+        if cache: blocks = _tee_to_cache(blocks, cache, key, meta)
+
+        def done(sent):
+            if capture: capture.save(stats)
+            _log_mask(digest, f, meta.get("pages"), stats, started, "miss" if cache else "off", True, sent)
+        blocks = _log_when_done(blocks, done)
+        resp = StreamingHttpResponse(blocks, content_type="application/pdf")
+    if capture: resp["X-Mask-Profile"] = capture.name  # MASK_PROFILE_DIR/<이름>.prof / .json
+    resp["Content-Disposition"] = 'attachment; filename="masked.pdf"'
+    return resp
 
 
 def health(request):
@@ -25,45 +194,17 @@ def upload_form(request):
     if not f:
         return HttpResponseBadRequest("파일이 필요합니다 (field name: file)")
 
-    # 옵션 파싱
-    def _get(name, default=None):
-        return request.POST.get(name, request.GET.get(name, default))
-
-    opts = {}
-    m = _get("mode", "redact")
-    if m:
-        opts["mode"] = m
-
-    t = _get("target_mode", "both")
-    if t:
-        opts["target_mode"] = t
-
-    r = _get("mask_ratio", "0.95")
     try:
-        opts["mask_ratio"] = float(r)
-    except ValueError:
-        return HttpResponseBadRequest("mask_ratio must be float")
-
-    ml = _get("min_mask_len")
-    if ml is not None and ml != "":
-        try:
-            opts["min_mask_len"] = int(ml)
-        except ValueError:
-            return HttpResponseBadRequest("min_mask_len must be int")
-
-    ans = _get("allow_noun_span")
-    if ans is not None and ans != "":
-        opts["allow_noun_span"] = str(ans).lower() in ("1", "true", "yes", "on")
+        opts = _parse_opts(request)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
 
     try:
-        out_bytes = mask_pdf_bytes(f.read(), **opts)
+        return _mask_response(f, opts, profiling.reason(request))
     except Exception as e:
+        metrics.record_error("upload_form")
         return HttpResponseBadRequest(f"처리 오류: {e}")
 
-    resp = HttpResponse(out_bytes, content_type="application/pdf")
-    resp["Content-Disposition"] = 'attachment; filename="masked.pdf"'
-    return resp
-
 
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -73,51 +214,183 @@ def mask_api(request):
       file: PDF 파일
     옵션(쿼리스트링 또는 form field):
       mode: redact|highlight
-      target_mode: both|josa_only|nouns_only
+      target_mode: both|josa_only|nouns_only|keywords
+      keywords: target_mode=keywords 의 단어 목록 (텍스트 파일 또는 줄바꿈/쉼표 구분)
       mask_ratio: 0.0~1.0
       min_mask_len: int
       allow_noun_span: true|false
+      seed: int (생략 시 입력 해시에서 결정 → 같은 입력은 같은 결과)
     """
     f = request.FILES.get("file")
     if not f:
         return HttpResponseBadRequest("file field is required (PDF)")
 
-    # 옵션 파싱 유틸
-    def _get(name, default=None):
-        return request.POST.get(name, request.GET.get(name, default))
+    try:
+        opts = _parse_opts(request)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
 
-    opts = {}
-    m = _get("mode")
-    if m:
-        opts["mode"] = m
-
-    t = _get("target_mode")
-    if t:
-        opts["target_mode"] = t
-
-    r = _get("mask_ratio")
-    if r is not None:
-        try:
-            opts["mask_ratio"] = float(r)
-        except ValueError:
-            return HttpResponseBadRequest("mask_ratio must be float")
-
-    ml = _get("min_mask_len")
-    if ml is not None:
-        try:
-            opts["min_mask_len"] = int(ml)
-        except ValueError:
-            return HttpResponseBadRequest("min_mask_len must be int")
+    try:
+        return _mask_response(f, opts, profiling.reason(request))
+    except Exception as e:
+        metrics.record_error("mask_api")
+        return HttpResponseBadRequest(f"processing error: {e}")
 
-    ans = _get("allow_noun_span")
-    if ans is not None:
-        opts["allow_noun_span"] = str(ans).lower() in ("1", "true", "yes", "on")
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def mask_batch_api(request):
+    """
+    여러 PDF 를 한 번에 마스킹해 ZIP 으로 스트리밍.
+    multipart/form-data:
+      files (또는 file): PDF 여러 개, 또는 PDF 가 든 ZIP
+    옵션: /mask 와 동일 (모든 파일에 적용)
+    응답 ZIP: 입력 이름 그대로의 결과 PDF, 실패한 파일은 <이름>.error.txt, 마지막에 manifest.json (파일별 상태)
+    """
+    files = request.FILES.getlist("files") + request.FILES.getlist("file")
+    if not files:
+        return HttpResponseBadRequest("files field is required (PDFs or a ZIP)")
 
     try:
-        out_bytes = mask_pdf_bytes(f.read(), **opts)
+        opts = _parse_opts(request)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    workers = getattr(settings, "MASK_BATCH_WORKERS", None)
+    if workers is None: workers = budget().page_workers  # engine/concurrency.py
+    blocks = iter_batch_zip(files, opts, workers=workers,
+                            max_files=getattr(settings, "MASK_BATCH_MAX_FILES", 500),
+                            max_file_bytes=getattr(settings, "MASK_BATCH_MAX_FILE_BYTES", None))
+    resp = StreamingHttpResponse(blocks, content_type="application/zip")
+    resp["Content-Disposition"] = 'attachment; filename="masked.zip"'
+    return resp
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def analyze_api(request):
+    """
+    형태소 분석만 수행해 마스크 플랜(JSON)을 반환.
+    multipart/form-data:
+      file: PDF 파일
+    옵션: target_mode, min_mask_len, allow_noun_span (mask_api 와 동일)
+    """
+    f = request.FILES.get("file")
+    if not f:
+        return HttpResponseBadRequest("file field is required (PDF)")
+
+    try:
+        opts = _parse_opts(request)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    started = time.perf_counter()
+    stats = MaskStats() if getattr(settings, "MASK_STATS", True) else None
+    try:
+        plan = analyze_pdf(_upload_source(f), stats=stats, **dict(opts, workers=budget().page_workers))
     except Exception as e:
+        metrics.record_error("analyze_api")
         return HttpResponseBadRequest(f"processing error: {e}")
+    metrics.record_mask(plan["page_count"], time.perf_counter() - started, timers=stats.timers if stats else None,
+                        endpoint="analyze")
+    return JsonResponse(plan, json_dumps_params={"ensure_ascii": False})
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def render_api(request):
+    """
+    /analyze 의 플랜을 PDF 에 적용 (Kiwi 분석 없이 다시 그리기).
+    multipart/form-data:
+      file: PDF 파일 (플랜을 만든 것과 같은 파일)
+      plan: /analyze 응답 JSON (form field 또는 파일)
+    옵션: mode, mask_ratio, seed (mask_api 와 동일)
+    """
+    f = request.FILES.get("file")
+    if not f:
+        return HttpResponseBadRequest("file field is required (PDF)")
 
-    resp = HttpResponse(out_bytes, content_type="application/pdf")
+    raw = request.FILES["plan"].read() if "plan" in request.FILES else request.POST.get("plan")
+    if not raw:
+        return HttpResponseBadRequest("plan field is required (JSON from /analyze)")
+    try:
+        plan = json.loads(raw)
+        opts = _parse_opts(request)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    if not isinstance(plan, dict):
+        return HttpResponseBadRequest("plan must be a JSON object")
+
+    digest = hash_file(f)
+    if plan.get("sha256") != digest:
+        return HttpResponseBadRequest("plan was made from a different PDF")
+    opts.setdefault("seed", int(digest[:8], 16))
+
+    started = time.perf_counter()
+    out = tempfile.TemporaryFile()
+    try:
+        render_pdf(_upload_source(f), plan, dst=out, **opts)
+    except Exception as e:
+        out.close()
+        metrics.record_error("render_api")
+        return HttpResponseBadRequest(f"processing error: {e}")
+    metrics.record_mask(plan.get("page_count"), time.perf_counter() - started, endpoint="render")
+
+    out.seek(0)
+    resp = FileResponse(out, content_type="application/pdf")
+    resp["Content-Disposition"] = 'attachment; filename="masked.pdf"'
+    return resp
+
+
+def _job_urls(job):
+    return {"status_url": f"/jobs/{job.id}", "result_url": f"/jobs/{job.id}/result"}
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def jobs_api(request):
+    """
+    비동기 마스킹. 업로드를 큐에 넣고 바로 202 + 작업 id 반환 (실행은 mask_worker 프로세스).
+    multipart/form-data: file + /mask 와 같은 옵션
+    """
+    f = request.FILES.get("file")
+    if not f:
+        return HttpResponseBadRequest("file field is required (PDF)")
+
+    try:
+        opts = _parse_opts(request)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    try:
+        job = jobs.enqueue(f, opts)
+    except jobs.QueueFull as e:
+        resp = JsonResponse({"error": str(e)}, status=503)
+        resp["Retry-After"] = "30"
+        return resp
+    return JsonResponse(dict(job.as_dict(), **_job_urls(job)), status=202)
+
+
+@require_http_methods(["GET"])
+def job_status(request, job_id):
+    job = MaskJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return JsonResponse({"error": "job not found"}, status=404)
+    return JsonResponse(dict(job.as_dict(), **_job_urls(job)))
+
+
+@require_http_methods(["GET"])
+def job_result(request, job_id):
+    """완료된 작업의 결과 PDF. 아직 안 끝났거나 실패했으면 409, 결과 파일이 지워졌으면 410 + 상태 JSON"""
+    job = MaskJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return JsonResponse({"error": "job not found"}, status=404)
+    if job.status != MaskJob.DONE:
+        return JsonResponse(job.as_dict(), status=409)
+    try:
+        f = open(job.output_path, "rb")
+    except FileNotFoundError:
+        return JsonResponse(dict(job.as_dict(), error="result file is gone"), status=410)
+    resp = FileResponse(f, content_type="application/pdf")
     resp["Content-Disposition"] = 'attachment; filename="masked.pdf"'
     return resp
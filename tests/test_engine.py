@@ -1,8 +1,364 @@
 # \test\test_engine.py
 
+import re
+
 from engine.mask_engine import mask_pdf_bytes
 
+def _strip_id(pdf):
+    # 트레일러 /ID 는 저장 시각 기반이라 매번 다르다
+    # (두 번째 원소는 hex 가 아니라 literal string 으로 써지기도 한다)
+    return re.sub(rb"/ID\[(?:<[0-9A-Fa-f]*>|\((?:\\.|[^\\)])*\))*\]", b"", pdf, flags=re.S)
+
 def test_basic_masking():
     with open("sample_data/test_1.pdf", "rb") as f:
         out = mask_pdf_bytes(f.read())
     assert isinstance(out, bytes)
+
+def test_batched_tokenize_matches_per_line():
+    from engine.mask_engine import _kiwi, _tokenize_lines
+    texts = ["계약서의 조항은 당사자에게 적용된다", "처리기 스케줄링", "2024년 3월 학생이 제출한 보고서"]
+    as_tuples = lambda toks: [(t.form, t.tag, t.start, t.len) for t in toks]
+    batched = _tokenize_lines(texts)
+    assert [as_tuples(t) for t in batched] == [as_tuples(_kiwi().tokenize(x)) for x in texts]
+
+def test_parallel_matches_serial_with_seed():
+    with open("sample_data/test_2.pdf", "rb") as f:
+        pdf = f.read()
+    serial = mask_pdf_bytes(pdf, seed=7, chunk_pages=2)
+    parallel = mask_pdf_bytes(pdf, seed=7, chunk_pages=2, workers=2)
+    assert _strip_id(serial) == _strip_id(parallel)
+
+def test_streaming_blocks_form_one_pdf():
+    import fitz
+    from engine.mask_engine import iter_mask_pdf
+    with open("sample_data/test_2.pdf", "rb") as f:
+        pdf = f.read()
+    blocks = list(iter_mask_pdf(pdf, seed=3, chunk_pages=2))
+    assert len(blocks) == 3
+    streamed = fitz.open(stream=b"".join(blocks), filetype="pdf")
+    whole = fitz.open(stream=mask_pdf_bytes(pdf, seed=3, chunk_pages=2), filetype="pdf")
+    assert len(streamed) == len(whole) == 12
+    assert [p.get_text() for p in streamed] == [p.get_text() for p in whole]
+
+def test_span_cache_lru_eviction_and_counters():
+    from engine.span_cache import SpanCache
+    cache = SpanCache(max_entries=2, max_bytes=1 << 20)
+    cache.put(("k", "a"), ((0, 2),)); cache.put(("k", "b"), ())
+    assert cache.get(("k", "a")) == ((0, 2),)   # a 가 최근 사용으로 이동
+    cache.put(("k", "c"), ())                    # → b 가 밀려난다
+    assert cache.get(("k", "b")) is None
+    st = cache.stats()
+    assert (st["entries"], st["hits"], st["misses"], st["evictions"]) == (2, 1, 1, 1)
+    cache.configure(max_bytes=1)
+    assert cache.stats()["entries"] == 0
+
+def test_span_cache_results_match_uncached():
+    from engine.mask_engine import _spans_for_texts, configure_span_cache, span_cache_stats
+    from engine.span_cache import SPAN_CACHE
+    SPAN_CACHE.clear()
+    key = ("both", True, 2, frozenset({"SL", "SN"}), frozenset({"은", "는", "이", "가", "을", "를", "에게"}))
+    texts = ["계약서의 조항은 당사자에게 적용된다", "- 3 -", "계약서의 조항은 당사자에게 적용된다"]
+    plain = _spans_for_texts(texts, key, use_cache=False)
+    assert _spans_for_texts(texts, key) == plain
+    assert _spans_for_texts(texts, key) == plain
+    st = span_cache_stats()
+    assert st["hits"] == 3 and st["misses"] == 3
+
+def test_result_cache_key_and_eviction(tmp_path):
+    import os, time
+    from engine.result_cache import ResultCache, cache_key
+    # 결과에 영향 없는 옵션은 키에 들어가지 않는다
+    assert cache_key("ab", {"seed": 1}) == cache_key("ab", {"seed": 1, "workers": 8})
+    assert cache_key("ab", {"seed": 1}) != cache_key("ab", {"seed": 2})
+    cache = ResultCache(tmp_path, max_bytes=10, ttl=0)
+    cache.put("old", b"123456")
+    os.utime(tmp_path / "old.pdf", (time.time() - 60, time.time() - 60))
+    cache.put("new", b"123456", {"pages": 3})  # 합계 12 > 10 → 오래된 항목 제거
+    assert cache.get("old") is None and cache.get("new") == b"123456"
+    assert cache.meta("new") == {"pages": 3} and cache.meta("old") == {}
+    os.utime(tmp_path / "new.pdf", (time.time() - 60, time.time() - 60))
+    ResultCache(tmp_path, ttl=30).evict()  # TTL 만료
+    assert os.listdir(tmp_path) == []
+    # 자주 적중해도 TTL 은 만든 시각 기준 (적중은 LRU 순서만 바꾼다)
+    cache = ResultCache(tmp_path, ttl=30)
+    cache.put("hot", b"1")
+    os.utime(tmp_path / "hot.pdf", (time.time(), time.time() - 20))
+    assert cache.get("hot") == b"1"
+    os.utime(tmp_path / "hot.pdf", (time.time(), os.stat(tmp_path / "hot.pdf").st_mtime - 20))  # 20초 뒤 다시 적중
+    assert cache.get("hot") is None
+
+def test_render_of_analyze_plan_matches_mask_pdf_bytes():
+    import json
+    from engine.mask_engine import analyze_pdf, render_pdf
+    with open("sample_data/test_2.pdf", "rb") as f:
+        pdf = f.read()
+    plan = json.loads(json.dumps(analyze_pdf(pdf)))  # JSON 왕복 후에도 좌표가 그대로여야 한다
+    assert plan["page_count"] == 6 and any(p["candidates"] for p in plan["pages"])
+    for mode in ("redact", "highlight"):
+        assert _strip_id(render_pdf(pdf, plan, seed=3, mode=mode)) == _strip_id(mask_pdf_bytes(pdf, seed=3, mode=mode))
+
+def test_rects_from_ranges_bounds_each_range():
+    import numpy as np
+    from engine.mask_engine import _rects_from_ranges
+    bboxes = np.array([[0, 0, 1, 2], [1, 0, 2, 3], [2, 1, 3, 2], [3, 0, 4, 2]], dtype=np.float32)
+    out, valid = _rects_from_ranges(bboxes, [(0, 2), (2, 2), (2, 4)])
+    assert valid.tolist() == [True, False, True]
+    assert out[0].tolist() == [0, 0, 2, 3] and out[2].tolist() == [2, 0, 4, 2]
+
+def _merge_rects_reference(rects, x_gap=0.5, y_gap=0.12):
+    # 이전 fitz.Rect 기반 구현 (동등성 비교용)
+    import fitz
+    if not rects: return []
+    rects = sorted(rects, key=lambda r: (round((r.y0+r.y1)/2, 2), r.x0))
+    merged, cur = [], rects[0]
+    for r in rects[1:]:
+        same_line = abs((r.y0+r.y1)/2 - (cur.y0+cur.y1)/2) <= y_gap * max(1.0, (cur.height + r.height)/2)
+        close_h   = r.x0 <= cur.x1 + x_gap
+        if same_line and close_h:
+            cur = fitz.Rect(min(cur.x0, r.x0), min(cur.y0, r.y0), max(cur.x1, r.x1), max(cur.y1, r.y1))
+        else:
+            merged.append(cur); cur = r
+    merged.append(cur)
+    return merged
+
+def test_merge_boxes_matches_rect_implementation():
+    import random
+    import fitz
+    import numpy as np
+    from engine.mask_engine import _merge_boxes
+    rng = random.Random(0)
+    for trial in range(200):
+        n = rng.choice([0, 1, 2, 5, 50, 400])
+        boxes = []
+        for _ in range(n):
+            # 표처럼 몇 개의 줄/열에 몰린 좌표 (병합 경계 근처 값이 자주 나오도록)
+            x0 = rng.choice([10, 60, 110, 160]) + rng.uniform(-1, 40)
+            y0 = rng.choice([100, 112, 124, 300]) + rng.uniform(-2, 2)
+            boxes.append([x0, y0, x0 + rng.uniform(0.5, 20), y0 + rng.uniform(6, 14)])
+        boxes = np.array(boxes, dtype=np.float32).reshape(-1, 4)
+        expected = _merge_rects_reference([fitz.Rect(b) for b in boxes.tolist()])
+        merged, members = _merge_boxes(boxes)
+        assert [tuple(r) for r in expected] == [tuple(r) for r in merged.tolist()]
+        assert sorted(i for m in members for i in m) == list(range(n))
+
+def test_save_profiles_produce_same_pages():
+    import fitz, pytest
+    with open("sample_data/test_2.pdf", "rb") as f:
+        pdf = f.read()
+    out = {p: mask_pdf_bytes(pdf, seed=5, save_profile=p) for p in ("fast", "balanced", "smallest")}
+    texts = {p: [page.get_text() for page in fitz.open(stream=b, filetype="pdf")] for p, b in out.items()}
+    assert texts["fast"] == texts["balanced"] == texts["smallest"]
+    assert len(out["smallest"]) <= len(out["balanced"]) < len(out["fast"])
+    with pytest.raises(ValueError):
+        mask_pdf_bytes(pdf, save_profile="tiny")
+
+def test_layouts_reorder_the_same_pages():
+    import fitz
+    with open("sample_data/test_2.pdf", "rb") as f:
+        pdf = f.read()
+    def texts(b): return [page.get_text() for page in fitz.open(stream=b, filetype="pdf")]
+    pairs = texts(mask_pdf_bytes(pdf, seed=2, chunk_pages=4))
+    masked, originals = pairs[0::2], pairs[1::2]
+    assert texts(mask_pdf_bytes(pdf, seed=2, layout="masked_only")) == masked
+    assert texts(mask_pdf_bytes(pdf, seed=2, layout="answer_key", workers=2, chunk_pages=4)) == masked + originals
+
+def test_layered_layout_keeps_one_page_with_toggleable_layer():
+    import fitz
+    with open("sample_data/test_2.pdf", "rb") as f:
+        pdf = f.read()
+    for mode, name, on in (("highlight", "Mask", True), ("redact", "Original", False)):
+        out = fitz.open(stream=mask_pdf_bytes(pdf, seed=4, mode=mode, layout="layered", chunk_pages=4), filetype="pdf")
+        assert len(out) == 6
+        assert [(v["name"], v["on"]) for v in out.get_ocgs().values()] == [(name, on)]
+    # 구간(4+2쪽)을 합쳐도 레이어는 하나이고, 끄면 모든 구간이 원본과 같다
+    hl = fitz.open(stream=mask_pdf_bytes(pdf, seed=4, mode="highlight", layout="layered", chunk_pages=4), filetype="pdf")
+    hl.xref_set_key(hl.pdf_catalog(), "OCProperties/D/OFF", "[%d 0 R]" % next(iter(hl.get_ocgs())))
+    hl = fitz.open(stream=hl.tobytes(), filetype="pdf")
+    orig = fitz.open(stream=pdf, filetype="pdf")
+    assert all(hl[i].get_pixmap(dpi=20).samples == orig[i].get_pixmap(dpi=20).samples for i in (0, 5))
+
+def test_register_layers_keeps_nested_properties():
+    import fitz
+    from engine.mask_engine import _register_layers
+    doc = fitz.open(); page = doc.new_page()
+    mask = doc.add_ocg("Mask")
+    copied = doc.get_new_xref(); doc.update_object(copied, "<</Type/OCG/Name(Mask)>>")  # insert_pdf 로 딸려 온 미등록 OCG
+    doc.xref_set_key(page.xref, "Resources", f"<</Properties<</MC0 {copied} 0 R"
+                                             f"/MC1<</Type/OCMD/OCGs[{copied} 0 R]>>/MC2 {copied} 0 R>>>>")
+    _register_layers(doc)
+    get = lambda key: doc.xref_get_key(page.xref, "Resources/Properties/" + key)
+    assert get("MC0") == get("MC2") == ("xref", f"{mask} 0 R")
+    assert get("MC1/Type") == ("name", "/OCMD") and get("MC1/OCGs")[1].replace(" ", "") == f"[{mask}0R]"
+
+
+def test_text_only_redact_profile_looks_like_full():
+    import fitz, pytest
+    with open("sample_data/test_2.pdf", "rb") as f:
+        pdf = f.read()
+    full, lean = (fitz.open(stream=mask_pdf_bytes(pdf, seed=6, layout="masked_only", redact_profile=p), filetype="pdf")
+                  for p in ("full", "text_only"))
+    assert [p.get_text() for p in full] == [p.get_text() for p in lean]
+    assert full[0].get_pixmap(dpi=30).samples == lean[0].get_pixmap(dpi=30).samples
+    with pytest.raises(ValueError):
+        mask_pdf_bytes(pdf, redact_profile="none")
+
+def test_mask_pdf_file_writes_same_pdf_to_path_or_file(tmp_path):
+    import tempfile
+    from engine.mask_engine import mask_pdf_file
+    with open("sample_data/test_2.pdf", "rb") as f:
+        expected = _strip_id(mask_pdf_bytes(f.read(), seed=8))
+    mask_pdf_file("sample_data/test_2.pdf", tmp_path / "out.pdf", seed=8)
+    assert _strip_id((tmp_path / "out.pdf").read_bytes()) == expected
+    with tempfile.TemporaryFile() as out:  # name 이 int 인 파일 객체도 그대로 써져야 한다
+        mask_pdf_file("sample_data/test_2.pdf", out, seed=8)
+        out.seek(0)
+        assert _strip_id(out.read()) == expected
+
+def test_stats_record_every_stage_without_changing_output():
+    from engine.stats import STAGES, MaskStats
+    with open("sample_data/test_2.pdf", "rb") as f:
+        pdf = f.read()
+    stats = MaskStats()
+    assert _strip_id(mask_pdf_bytes(pdf, seed=9, stats=stats)) == _strip_id(mask_pdf_bytes(pdf, seed=9))
+    assert set(stats.timers) == set(STAGES)
+    assert stats.counters["pages"] == 6 and stats.counters["rects"] > 0 and stats.counters["tokens"] >= 0
+
+def test_keywords_mode_masks_every_dictionary_term():
+    import fitz
+    from engine.keywords import KeywordMatcher, keyword_matcher
+    assert KeywordMatcher(["he", "she", "his", "hers"]).find("ushers") == [(1, 4), (2, 6)]
+    terms = ["matplotlib", "히스토그램", "산점도"]
+    assert keyword_matcher(terms) is keyword_matcher(list(reversed(terms)))  # 같은 단어 집합 → 캐시된 오토마톤
+    with open("sample_data/test_2.pdf", "rb") as f:
+        pdf = f.read()
+    out = fitz.open(stream=mask_pdf_bytes(pdf, target_mode="keywords", keywords=terms, mask_ratio=1.0,
+                                          layout="masked_only", seed=1), filetype="pdf")
+    text = "".join(page.get_text() for page in out)
+    assert not any(t in text for t in terms) and "막대 그래프" in text
+
+def test_tokenizer_service_batches_concurrent_clients(tmp_path, monkeypatch):
+    import threading
+    import engine.mask_engine as me
+    from engine.tokenizer_service import TokenizerClient, TokenizerServer
+    server = TokenizerServer(str(tmp_path / "kiwi.sock"), kiwi=me._kiwi(), window=0.05)  # 이미 올라온 Kiwi 를 빌려 쓴다
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        texts = ["계약서의 조항은 당사자에게 적용된다", "처리기 스케줄링", "2024년 3월 학생이 제출한 보고서"]
+        expected = [[(t.form, t.tag, t.start, t.len) for t in toks] for toks in me._kiwi().tokenize(texts)]
+        client = TokenizerClient(server.path)
+        results = [None] * 8
+        def work(i): results[i] = client.tokenize(texts)
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        assert all([list(map(tuple, toks)) for toks in r] == expected for r in results)
+        assert client.ping()["batches"] < 8  # 동시에 들어온 요청은 한 번에
+        with open("sample_data/test_2.pdf", "rb") as f:
+            pdf = f.read()
+        local = mask_pdf_bytes(pdf, seed=2, span_cache=False)
+        monkeypatch.setattr(me, "_TOKENIZER", client)  # 엔진이 데몬을 쓰도록
+        assert _strip_id(mask_pdf_bytes(pdf, seed=2, span_cache=False)) == _strip_id(local)
+        assert client.ping()["lines"] > 3 * 8
+    finally:
+        server.shutdown(); server.server_close()
+
+def test_tokenizer_client_does_not_resend_on_timeout(tmp_path):
+    import socket, threading, pytest
+    from engine.tokenizer_service import TokenizerClient
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(tmp_path / "slow.sock")); listener.listen()
+    accepted = []
+    def serve():  # 받기만 하고 답하지 않는 (과부하) 데몬
+        while True:
+            try: accepted.append(listener.accept()[0])
+            except OSError: return
+    threading.Thread(target=serve, daemon=True).start()
+    try:
+        with pytest.raises(TimeoutError):
+            TokenizerClient(str(tmp_path / "slow.sock"), timeout=0.2).tokenize(["문장"])
+        assert len(accepted) == 1
+        with pytest.raises(FileNotFoundError):  # 연결 실패는 한 번 더 시도한 뒤에 올린다
+            TokenizerClient(str(tmp_path / "missing.sock")).ping()
+    finally:
+        listener.close()
+        for conn in accepted: conn.close()
+
+def test_forked_child_reloads_kiwi():
+    # gunicorn --preload: 부모가 Kiwi 를 올린 채 fork 해도 자식은 멈추지 않고 자기 Kiwi 를 새로 올린다
+    import os, signal, time
+    import engine.mask_engine as me
+    me._kiwi()
+    pid = os.fork()
+    if pid == 0:
+        ok = me._KIWI is None and len(me._tokenize_lines(["계약서의 조항은 당사자에게 적용된다"] * 4)) == 4
+        os._exit(0 if ok else 1)
+    deadline = time.monotonic() + 60
+    while (done := os.waitpid(pid, os.WNOHANG))[0] == 0 and time.monotonic() < deadline: time.sleep(0.05)
+    if done[0] == 0: os.kill(pid, signal.SIGKILL); os.waitpid(pid, 0)
+    assert done[0] == pid and os.waitstatus_to_exitcode(done[1]) == 0
+
+def test_cpu_budget_follows_cgroup_quota_and_env(tmp_path):
+    from engine.concurrency import cgroup_cpu_limit, cgroup_memory_limit, resolve
+    proc = tmp_path / "cgroup"
+    proc.write_text("0::/pod/app\n")
+    (tmp_path / "v2" / "pod" / "app").mkdir(parents=True)
+    (tmp_path / "v2" / "pod" / "app" / "cpu.max").write_text("250000 100000\n")
+    assert cgroup_cpu_limit(str(tmp_path / "v2"), str(proc)) == 2.5
+    (tmp_path / "v2" / "pod" / "app" / "cpu.max").write_text("max 100000\n")
+    assert cgroup_cpu_limit(str(tmp_path / "v2"), str(proc)) is None
+    proc.write_text("4:cpu,cpuacct:/\n")
+    (tmp_path / "v1" / "cpu,cpuacct").mkdir(parents=True)
+    (tmp_path / "v1" / "cpu,cpuacct" / "cpu.cfs_quota_us").write_text("400000\n")
+    (tmp_path / "v1" / "cpu,cpuacct" / "cpu.cfs_period_us").write_text("100000\n")
+    assert cgroup_cpu_limit(str(tmp_path / "v1"), str(proc)) == 4.0
+    # 워커 수 × 워커 안의 Kiwi 스레드 ≤ 코어 수
+    assert resolve({}, cpus=1, memory_mb=64000)[1:5] == (2, 1, 0, 1)
+    assert resolve({}, cpus=8, memory_mb=64000)[1:5] == (4, 2, 2, 1)
+    b = resolve({"MASK_CPUS": "16", "WEB_CONCURRENCY": "3", "MASK_PAGE_WORKERS": "0"}, cpus=2, memory_mb=64000)
+    assert (b.cpus, b.http_workers, b.kiwi_threads, b.page_workers) == (16, 3, 5, 0)
+    assert b.source == "cpus,http_workers,page_workers"
+    # 프로세스마다 Kiwi (600MB) → 메모리가 워커 수와 풀을 제한한다. 데몬을 쓰면 프로세스가 가벼워 코어 기준 그대로
+    assert resolve({}, cpus=32, memory_mb=4096)[1:4] == (6, 5, 0)
+    assert resolve({}, cpus=8, memory_mb=4096)[1:4] == (4, 2, 0)
+    assert resolve({"MASK_TOKENIZER_SOCKET": "/tmp/k.sock"}, cpus=32, memory_mb=4096)[1:3] == (16, 2)
+    assert resolve({"WEB_CONCURRENCY": "8"}, cpus=32, memory_mb=1024).http_workers == 8  # 직접 준 값은 그대로
+    (tmp_path / "v2" / "pod" / "app" / "memory.max").write_text("4294967296\n")
+    proc.write_text("0::/pod/app\n")
+    assert cgroup_memory_limit(str(tmp_path / "v2"), str(proc)) == 4 << 30
+
+def test_pool_is_rebuilt_after_a_worker_dies():
+    import os, signal, time
+    import engine.mask_engine as me
+    with open("sample_data/test_2.pdf", "rb") as f:
+        pdf = f.read()
+    expected = _strip_id(mask_pdf_bytes(pdf, seed=7, chunk_pages=2, workers=2))
+    for proc in list(me._POOLS[2]._processes.values()): os.kill(proc.pid, signal.SIGKILL)  # OOM kill 흉내
+    deadline = time.monotonic() + 30
+    while not me._POOLS[2]._broken and time.monotonic() < deadline: time.sleep(0.05)
+    assert me._POOLS[2]._broken
+    assert _strip_id(mask_pdf_bytes(pdf, seed=7, chunk_pages=2, workers=2)) == expected
+
+
+def test_pools_of_different_sizes_do_not_replace_each_other():
+    import engine.mask_engine as me
+    # /mask (page_workers) 와 /mask/batch (MASK_BATCH_WORKERS) 가 동시에 돌아도 서로의 풀을 닫지 않는다
+    two = me._get_pool(2)
+    three = me._get_pool(3)
+    assert me._get_pool(2) is two and not two._shutdown_thread and three is not two
+
+
+def test_mask_files_survives_a_dead_pool(tmp_path):
+    import os, signal, time
+    import engine.mask_engine as me
+    from engine.mask_engine import iter_mask_files
+
+    def items():
+        yield "sample_data/test_2.pdf", str(tmp_path / "a.pdf"), {}
+        for proc in list(me._POOLS[2]._processes.values()): os.kill(proc.pid, signal.SIGKILL)  # a 처리 중에 풀이 죽는다
+        deadline = time.monotonic() + 30
+        while not me._POOLS[2]._broken and time.monotonic() < deadline: time.sleep(0.05)
+        yield "sample_data/test_2.pdf", str(tmp_path / "b.pdf"), {}
+
+    errors = [error for _, _, error in iter_mask_files(items(), workers=2, seed=1)]
+    assert "BrokenProcessPool" in errors[0] and errors[1] is None
+    assert (tmp_path / "b.pdf").read_bytes().startswith(b"%PDF")
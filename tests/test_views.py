@@ -0,0 +1,242 @@
+# \test\test_views.py
+
+import json, os, sys, uuid
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.dev")
+
+import django
+django.setup()
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, override_settings
+
+from masker.views import mask_api
+
+
+def _upload(path="sample_data/test_2.pdf"):
+    with open(path, "rb") as f:
+        return SimpleUploadedFile("test.pdf", f.read(), content_type="application/pdf")
+
+
+@override_settings(MASK_STREAM_THRESHOLD=0, MASK_RESULT_CACHE_DIR=None)
+def test_mask_api_streams_large_uploads():
+    req = RequestFactory().post("/mask", {"file": _upload()})
+    resp = mask_api(req)
+    assert resp.status_code == 200
+    assert resp.streaming
+    body = b"".join(resp.streaming_content)
+    assert body.startswith(b"%PDF") and b"%%EOF" in body[-32:]
+
+
+def test_mask_api_serves_repeat_uploads_from_result_cache(tmp_path, monkeypatch):
+    import masker.views as views
+    with override_settings(MASK_RESULT_CACHE_DIR=str(tmp_path)):
+        first = mask_api(RequestFactory().post("/mask?seed=5", {"file": _upload()}))
+        assert first.status_code == 200 and "X-Mask-Cache" not in first
+
+        def _boom(*a, **kw): raise AssertionError("engine must not run on a cache hit")
+        monkeypatch.setattr(views, "mask_pdf_file", _boom)
+        second = mask_api(RequestFactory().post("/mask?seed=5", {"file": _upload()}))
+        assert second.status_code == 200 and second["X-Mask-Cache"] == "hit"
+        assert b"".join(second.streaming_content) == b"".join(first.streaming_content)
+
+
+def test_analyze_then_render_roundtrip():
+    from masker.views import analyze_api, render_api
+    plan = analyze_api(RequestFactory().post("/analyze", {"file": _upload()}))
+    assert plan.status_code == 200
+    resp = render_api(RequestFactory().post("/render?mode=highlight&mask_ratio=0.5",
+                                            {"file": _upload(), "plan": plan.content.decode("utf-8")}))
+    assert resp.status_code == 200 and b"".join(resp.streaming_content).startswith(b"%PDF")
+
+    other = render_api(RequestFactory().post("/render", {"file": _upload("sample_data/test_1.pdf"),
+                                                         "plan": plan.content.decode("utf-8")}))
+    assert other.status_code == 400
+
+
+@pytest.fixture
+def job_db(tmp_path):
+    # 작업 큐 테스트용 임시 DB (마이그레이션 포함)
+    from django.test.utils import setup_databases, teardown_databases
+    old = setup_databases(verbosity=0, interactive=False)
+    with override_settings(MASK_JOB_DIR=str(tmp_path)):
+        yield
+    teardown_databases(old, verbosity=0)
+
+
+def test_job_roundtrip_with_progress(job_db):
+    from masker import jobs
+    from masker.views import jobs_api, job_status, job_result
+    created = jobs_api(RequestFactory().post("/jobs?mode=highlight", {"file": _upload()}))
+    assert created.status_code == 202
+    job_id = json.loads(created.content)["id"]
+    assert job_result(RequestFactory().get("/"), job_id).status_code == 409  # 아직 실행 전
+
+    assert jobs.claim("test") == uuid.UUID(job_id)
+    jobs.run_job(job_id, "test")  # 워커 자식 프로세스가 하는 일을 그대로
+    status = json.loads(job_status(RequestFactory().get("/"), job_id).content)
+    assert status["status"] == "done" and status["progress"] == {"pages_done": 6, "page_count": 6}
+    resp = job_result(RequestFactory().get("/"), job_id)
+    assert resp.status_code == 200 and b"".join(resp.streaming_content).startswith(b"%PDF")
+    os.remove(os.path.join(jobs.job_dir(job_id), "output.pdf"))
+    assert job_result(RequestFactory().get("/"), job_id).status_code == 410
+
+
+def test_jobs_of_dead_workers_are_requeued_then_failed(job_db):
+    from datetime import timedelta
+    from django.utils import timezone
+    from masker import jobs
+    from masker.models import MaskJob
+    job = jobs.enqueue(_upload(), {})
+    with override_settings(MASK_JOB_MAX_ATTEMPTS=2, MASK_JOB_STALE_SECONDS=60):
+        for expected in ("queued", "failed"):
+            assert jobs.claim("dead-worker") == job.id
+            MaskJob.objects.filter(pk=job.id).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+            assert jobs.recover_stale() == 1
+            assert MaskJob.objects.get(pk=job.id).status == expected
+        with override_settings(MASK_JOB_MAX_QUEUED=1):
+            jobs.enqueue(_upload(), {})
+            with pytest.raises(jobs.QueueFull):
+                jobs.enqueue(_upload(), {})
+
+
+def test_requeued_job_ignores_the_previous_run(job_db):
+    from masker import jobs
+    job = jobs.enqueue(_upload(), {})
+    assert jobs.claim("old") == job.id
+    jobs.release(job.id, "worker pool restarted")
+    assert jobs.claim("new") == job.id
+    jobs.run_job(job.id, "old")  # 다시 큐에 들어가기 전의 실행이 늦게 도착
+    job.refresh_from_db()
+    assert job.status == "running" and job.worker == "new" and not job.output_path
+
+
+@override_settings(MASK_BATCH_WORKERS=0)
+def test_mask_batch_streams_zip_with_per_file_status():
+    import io, zipfile
+    from masker.views import mask_batch_api
+    packed = io.BytesIO()
+    with zipfile.ZipFile(packed, "w") as zf:
+        zf.write("sample_data/test_2.pdf", "set/a.pdf")
+        zf.writestr("set/broken.pdf", b"%PDF-1.4 not really")
+        zf.writestr("set/notes.txt", "skip me")
+    files = [_upload(), _upload(), SimpleUploadedFile("pack.zip", packed.getvalue())]
+    resp = mask_batch_api(RequestFactory().post("/mask/batch?seed=1", {"files": files}))
+    assert resp.status_code == 200 and resp.streaming
+    out = zipfile.ZipFile(io.BytesIO(b"".join(resp.streaming_content)))
+    assert out.namelist() == ["test.pdf", "test-2.pdf", "set/a.pdf", "set/broken.pdf.error.txt", "manifest.json"]
+    assert all(out.read(n).startswith(b"%PDF") for n in ("test.pdf", "test-2.pdf", "set/a.pdf"))
+    status = {e["name"]: e["status"] for e in json.loads(out.read("manifest.json"))}
+    assert status == {"test.pdf": "ok", "set/a.pdf": "ok", "set/broken.pdf": "error", "set/notes.txt": "skipped"}
+
+    # 깨진 ZIP, 크기 초과, 개수 초과: 그 항목만 manifest 에 남고 응답은 끝까지 간다
+    limit = len(_upload().read())
+    files = [_upload(), SimpleUploadedFile("bad.zip", b"PK not a zip"), SimpleUploadedFile("big.pdf", b"x" * (limit + 1)),
+             _upload(), _upload()]
+    with override_settings(MASK_BATCH_MAX_FILES=4, MASK_BATCH_MAX_FILE_BYTES=limit):
+        resp = mask_batch_api(RequestFactory().post("/mask/batch?seed=1", {"files": files}))
+        out = zipfile.ZipFile(io.BytesIO(b"".join(resp.streaming_content)))
+    manifest = json.loads(out.read("manifest.json"))
+    assert [(e["name"], e["status"]) for e in manifest] == [
+        ("test.pdf", "ok"), ("bad.zip", "error"), ("big.pdf", "error"), ("test.pdf", "ok"), ("test.pdf", "skipped")]
+    assert "BadZipFile" in manifest[1]["error"] and "larger than" in manifest[2]["error"] and "more than 4" in manifest[4]["error"]
+
+
+@override_settings(MASK_BATCH_WORKERS=0)
+def test_mask_batch_accepts_more_files_than_django_default():
+    import io, zipfile
+    from masker.views import mask_batch_api
+    # Django 기본 DATA_UPLOAD_MAX_NUMBER_FILES (100) 를 넘는 요청도 ZIP + manifest 로 끝까지 간다
+    files = [SimpleUploadedFile(f"bad{i}.pdf", b"%PDF-1.4 not really") for i in range(120)]
+    resp = mask_batch_api(RequestFactory().post("/mask/batch", {"files": files}))
+    assert resp.status_code == 200 and resp["Content-Type"] == "application/zip"
+    manifest = json.loads(zipfile.ZipFile(io.BytesIO(b"".join(resp.streaming_content))).read("manifest.json"))
+    assert len(manifest) == 120 and {e["status"] for e in manifest} == {"error"}
+
+
+@override_settings(MASK_RESULT_CACHE_DIR=None)
+def test_mask_api_reports_stage_timings(caplog):
+    with caplog.at_level("INFO", logger="masker"):
+        resp = mask_api(RequestFactory().post("/mask", {"file": _upload()}))
+    assert resp.status_code == 200
+    assert "tokenize;dur=" in resp["Server-Timing"] and "total;dur=" in resp["Server-Timing"]
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record["event"] == "mask" and record["pages"] == 6 and record["bytes_out"] > 0
+
+
+@override_settings(MASK_STATS=False)
+def test_page_count_is_recorded_without_stats_and_on_cache_hits(tmp_path, caplog, monkeypatch):
+    from masker import metrics
+    from masker.views import analyze_api
+    monkeypatch.setattr(metrics.REGISTRY, "values", {})
+    with override_settings(MASK_RESULT_CACHE_DIR=str(tmp_path)), caplog.at_level("INFO", logger="masker"):
+        assert mask_api(RequestFactory().post("/mask?seed=5", {"file": _upload()})).status_code == 200
+
+        def _boom(*a, **kw): raise AssertionError("a cache hit must not open the PDF")
+        with monkeypatch.context() as m:  # 적중 페이지 수는 캐시 메타데이터에서
+            import fitz, engine.mask_engine
+            m.setattr(fitz, "open", _boom); m.setattr(engine.mask_engine, "page_count", _boom)
+            assert mask_api(RequestFactory().post("/mask?seed=5", {"file": _upload()}))["X-Mask-Cache"] == "hit"
+    records = [json.loads(r.getMessage()) for r in caplog.records if r.getMessage().startswith('{"event": "mask"')]
+    assert [(r["cache"], r["pages"]) for r in records] == [("miss", 6), ("hit", 6)]
+    assert analyze_api(RequestFactory().post("/analyze", {"file": _upload()})).status_code == 200
+    assert metrics.REGISTRY.values["masker_mask_pages_total|endpoint=mask"] == 12
+    assert metrics.REGISTRY.values["masker_mask_pages_total|endpoint=analyze"] == 6
+
+
+def test_metrics_sum_all_worker_processes(tmp_path, monkeypatch):
+    import subprocess
+    from django.test import Client
+    from masker import metrics
+    monkeypatch.setattr(metrics.REGISTRY, "values", {})  # 앞선 테스트가 이 프로세스에 남긴 값 제외
+    finished = subprocess.Popen([sys.executable, "-c", ""]); finished.wait()  # 이미 끝난 워커 pid
+    (tmp_path / f"{finished.pid}.json").write_text(json.dumps(
+        {"masker_requests_total|status=200,view=mask_api": 2, "masker_in_flight_requests|": 5}))
+    with override_settings(MASK_METRICS_DIR=str(tmp_path), MASK_RESULT_CACHE_DIR=None):
+        client = Client(HTTP_HOST="localhost")
+        assert client.post("/mask", {"file": _upload()}).status_code == 200
+        broken = SimpleUploadedFile("broken.pdf", b"%PDF-1.4 not really")
+        assert client.post("/mask", {"file": broken}).status_code == 400  # 엔진 실패는 400 이지만 오류로 센다
+        body = client.get("/metrics").content.decode()
+        again = client.get("/metrics").content.decode()  # 죽은 워커 값은 _dead.json 으로 옮겨져 계속 더해진다
+    assert 'masker_requests_total{status="200",view="mask_api"} 3' in body
+    assert 'masker_request_errors_total{reason="engine",view="mask_api"} 1' in body
+    assert 'masker_requests_total{status="200",view="mask_api"} 3' in again
+    assert "masker_in_flight_requests 1" in body  # /metrics 요청 자신 (죽은 워커의 in-flight 는 버린다)
+    assert 'masker_mask_duration_seconds_count{endpoint="mask",pages="1-10"} 1' in body
+    assert 'masker_stage_seconds_total{stage="tokenize"}' in body
+
+
+def test_profile_capture_needs_the_admin_token(tmp_path):
+    import pstats
+    with override_settings(MASK_PROFILE_DIR=str(tmp_path), MASK_PROFILE_TOKEN="s3cret", MASK_RESULT_CACHE_DIR=None):
+        plain = mask_api(RequestFactory().post("/mask", {"file": _upload()}, HTTP_X_MASK_PROFILE="guess"))
+        assert "X-Mask-Profile" not in plain and not list(tmp_path.iterdir())
+        resp = mask_api(RequestFactory().post("/mask?seed=3", {"file": _upload()}, HTTP_X_MASK_PROFILE="s3cret"))
+    name = resp["X-Mask-Profile"]
+    meta = json.loads((tmp_path / f"{name}.json").read_text())
+    assert meta["reason"] == "forced" and meta["options"]["seed"] == 3 and name.endswith(meta["sha256"][:12])
+    assert meta["options"]["workers"] == 0  # 풀 자식 프로세스의 시간은 잡히지 않으므로 직렬로
+    funcs = {fn for _, _, fn in pstats.Stats(str(tmp_path / f"{name}.prof")).stats}
+    assert "mask_pdf_file" in funcs and "_mask_pages" in funcs
+
+
+def test_ready_waits_for_warmup(monkeypatch):
+    import subprocess, time
+    from masker import readiness
+    # import 만으로는 Kiwi 를 올리지 않는다 (/health 가 바로 뜨고 --preload 마스터가 Kiwi 를 들고 fork 하지 않도록)
+    code = ("import django; django.setup(); import engine.mask_engine as me, masker.urls; "
+            "assert me._KIWI is None and not me.is_warm()")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    assert subprocess.run([sys.executable, "-c", code], env=env).returncode == 0
+    monkeypatch.setattr(readiness, "_STATE", {"status": "cold", "seconds": None, "error": None})
+    first = readiness.ready_view(RequestFactory().get("/ready"))
+    assert first.status_code == 503 and json.loads(first.content)["status"] == "warming"
+    deadline = time.monotonic() + 60
+    while not readiness.is_ready() and time.monotonic() < deadline: time.sleep(0.05)
+    resp = readiness.ready_view(RequestFactory().get("/ready"))
+    body = json.loads(resp.content)
+    assert resp.status_code == 200 and body["status"] == "ready" and body["warmup_seconds"] > 0